@@ -0,0 +1,31 @@
+from array import array
+from itertools import islice, zip_longest
+from money import parse_cents
+
+
+def expense_matrix(rows: list, columns=6, code="EUR"):
+    """Turns raw worksheet rows into one integer-cents array per column.
+    Empty cells, cells that are not amounts and amounts beyond
+    money.MAX_CENTS are skipped. Amounts
+    are rounded half up to whole cents, as Money.parse() rounds them.
+    Args:
+        rows (list): Expense rows as read from a month worksheet.
+        columns (int): Number of category columns, from column A.
+        code (str): Has a default value of "EUR".
+    Returns:
+        (list): array('q') of cents for each category column."""
+    # Transpose once; short rows are padded with empty cells.
+    transposed = islice(zip_longest(*rows, fillvalue=""), columns)
+    matrix = [
+        array("q", parse_cents(column, code))
+        for column in transposed
+    ]
+    # Columns that are missing entirely, e.g. in an empty sheet.
+    matrix.extend(array("q") for _ in range(columns - len(matrix)))
+    return matrix
+
+
+def category_totals(matrix: list):
+    """Returns:
+    (list): total cents of each category column."""
+    return [sum(column) for column in matrix]
@@ -0,0 +1,138 @@
+"""Sends a session's confirmed expenses while the user keeps typing.
+
+Each save is the whole state of the upload in progress: the expense
+row it will write, and the running totals, budget, remainder and
+Overview row as values batch_update data. The first save sent appends
+the expense row, so Sheets picks a row no other client is writing;
+every later write goes to that row or another fixed range, so sending
+a save twice, or an older one after a newer one failed, never adds a
+row. The writer thread sends only the newest of the saves
+waiting for it, and the queue is bounded, so a user typing faster than
+Sheets answers waits rather than piling up requests.
+
+Saves hold the month's lock while they are sent, and are skipped once
+another session has written the month (see month_lock): the running
+totals in them would undo that write.
+"""
+import queue
+import threading
+from contextlib import nullcontext
+from rate_limit import background
+from write_buffer import append_values, quoted
+import tracing
+
+# Saves waiting to be sent; save() blocks when this many are.
+QUEUE_SIZE = 8
+
+
+class Autosave(threading.Thread):
+    """Writer thread of one session.
+    Args:
+        spreadsheet (Spreadsheet): Spreadsheet the saves are sent to.
+        month (MonthLock): Lock of the month worksheet saved to.
+        title (str): Name of the month worksheet.
+        version (int): Version of the month the session read.
+        tracer (Tracer): Tracer of the session, or None.
+        size (int): Saves that may wait to be sent."""
+
+    def __init__(self, spreadsheet, month, title: str, version: int,
+                 tracer=None, size=QUEUE_SIZE):
+        super().__init__(name="autosave", daemon=True)
+        self.spreadsheet = spreadsheet
+        self.month = month
+        self.title = title
+        self.version = version
+        self.tracer = tracer
+        self.queue = queue.Queue(size)
+        # Expense row the saves go to, once the first one appended it.
+        self.row = None
+        # Values by range of the newest save Sheets accepted.
+        self.sent = {}
+        self.error = None
+        # Set once a save is skipped as another session wrote the month.
+        self.stale = False
+        # Set once the user waits for the saves, e.g. on upload.
+        self.waited = False
+        self.saves = 0
+        self.requests = 0
+
+    def save(self, data: list, values: list):
+        """Queues the state to be sent, waiting while the queue is full.
+        Args:
+            data (list): values batch_update data of the other cells.
+            values (list): User-entered values of the expense row.
+        Returns: None."""
+        self.saves += 1
+        self.queue.put((data, values))
+
+    def run(self):
+        stopped = False
+        while not stopped:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Each save replaces the ones before it; None stops.
+            saves = [item for item in items if item is not None]
+            stopped = len(saves) < len(items)
+            try:
+                if saves:
+                    self.send(*saves[-1])
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+    def row_range(self, width: int):
+        """Returns:
+        (str): the expense row's first width cells, as a range name."""
+        last = chr(ord("A") + width - 1)
+        return quoted(self.title, f"A{self.row}:{last}{self.row}")
+
+    def send(self, data: list, values: list):
+        """Writes one save; a failure is kept for the upload to see.
+        Returns: None."""
+        with self.month:
+            if self.month.version != self.version:
+                self.stale = True
+                return
+            # Nothing was appended, so there is nothing to put back.
+            if self.row is None and not any(values):
+                self.error = None
+                return
+            try:
+                # Served after calls users wait on, until this one's does.
+                priority = nullcontext() if self.waited else background()
+                with tracing.stage(self.tracer, "autosave"), priority:
+                    if self.row is None:
+                        self.row = append_values(
+                            self.spreadsheet, self.title, values)
+                        self.sent = {self.row_range(len(values)): [values]}
+                    else:
+                        data = data + [{"range": self.row_range(len(values)),
+                                        "values": [values]}]
+                    self.spreadsheet.values_batch_update(body={
+                        "valueInputOption": "USER_ENTERED", "data": data})
+            except Exception as error:
+                # The upload sends everything again.
+                self.error = error
+                return
+            self.version = self.month.written()
+        self.requests += 1
+        self.error = None
+        self.sent = {self.row_range(len(values)): [values],
+                     **{entry["range"]: entry["values"] for entry in data}}
+
+    def drain(self):
+        """Waits until every queued save has been sent or has failed.
+        Returns: None."""
+        self.waited = True
+        self.queue.join()
+
+    def close(self):
+        """Sends what is queued, then stops the thread.
+        Returns: None."""
+        self.waited = True
+        self.queue.put(None)
+        self.join()
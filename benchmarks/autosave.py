@@ -0,0 +1,101 @@
+"""Wait after choosing to upload, with and without autosave.
+
+Runs run.py's prompt flow against FakeSheets with injected latency. The
+simulated user takes --think seconds over every answer, and the time
+from answering 'u' to the next prompt is the wait measured. Without
+autosave the upload sends every write then; with it they have mostly
+been sent while the user was typing.
+
+Usage: python benchmarks/autosave.py [--latency 0.2] [--think 0.1]
+       [--expenses 3] [--repeat 3]
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+
+
+def answers(expenses: int):
+    """Returns:
+    (list): a user's answers, up to and including 'u'."""
+    script = ["Ana", "3", "p", "1000", "p"]
+    for number in range(expenses):
+        script += ["2", "12.50", "p", "a" if number < expenses - 1 else "c"]
+    return script + ["u"]
+
+
+def upload_wait(server, expenses: int, think: float):
+    """Runs one session, on a sheet with no budget for March yet, up to
+    the prompt after the upload.
+    Returns:
+        (float): seconds from answering 'u' to that prompt."""
+    run.SESSION.set(run.Session(server.spreadsheet))
+    script = iter(answers(expenses))
+    uploaded = []
+
+    def answer(prompt=""):
+        if uploaded:
+            # The prompt after the upload: stop here.
+            uploaded.append(time.perf_counter())
+            raise EOFError
+        time.sleep(think)
+        value = next(script)
+        if value == "u":
+            uploaded.append(time.perf_counter())
+        return value
+
+    builtins.input = answer
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            run.run_screens(run.ask_name)
+        except EOFError:
+            pass
+    run.end_session()
+    return uploaded[1] - uploaded[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--think", type=float, default=0.1)
+    parser.add_argument("--expenses", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    # Every session starts cold.
+    os.environ["TAG_TRACK_SNAPSHOTS"] = ""
+    run.clear_terminal = lambda: None
+    autosave_expenses = run.autosave_expenses
+    real_input = builtins.input
+
+    print(f"latency {args.latency * 1000:.0f} ms per request, "
+          f"{args.think * 1000:.0f} ms per answer")
+    print(f"{'':10} {'upload wait ms':>15} {'requests':>9}")
+    try:
+        for name, autosave in (("without", lambda: None),
+                               ("autosave", autosave_expenses)):
+            run.autosave_expenses = autosave
+            waits, requests = [], 0
+            for _ in range(args.repeat):
+                # A new sheet each time, so the answers stay the same.
+                server = FakeSheets(args.latency)
+                server.seed_months(run.MONTHS.values())
+                waits.append(upload_wait(server, args.expenses, args.think))
+                requests += sum(server.snapshot().values()) / args.repeat
+            print(f"{name:10} {statistics.median(waits) * 1000:15.0f} "
+                  f"{requests:9.1f}")
+    finally:
+        run.autosave_expenses = autosave_expenses
+        builtins.input = real_input
+
+
+if __name__ == "__main__":
+    main()
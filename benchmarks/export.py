@@ -0,0 +1,91 @@
+"""Peak memory, time and requests of export.py as the sheets grow.
+
+Exports a year whose months hold --rows rows each, then ten times as
+many, to a stream that discards what it is given. The peak is what
+tracemalloc sees while records are written; it should stay the same
+however many rows there are.
+
+Usage: python benchmarks/export.py [--latency 0.0] [--rows 1000]
+       [--page-size 500]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export  # noqa: E402
+import ledger  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+from formatting import format_many  # noqa: E402
+from run import COLUMNS, MONTHS  # noqa: E402
+
+MONTH_NAMES = list(MONTHS.values())
+
+
+class Discard(io.TextIOBase):
+    """Text stream that only counts what is written to it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        return len(text)
+
+
+def seed(server, rows: int, rng):
+    """Fills every month with rows of expenses, a third of them empty."""
+    server.seed_months(MONTH_NAMES)
+    for month in MONTH_NAMES:
+        values = [
+            format_many(rng.randint(1, 20000) / 100 for _ in range(6))
+            for _ in range(rows)]
+        for row in values[::3]:
+            row[:] = [""] * 6
+        server.backend.write(month, f"A3:F{rows + 2}", values)
+        server.backend.write(
+            month, ledger.LEDGER_RANGE, [["0"] * 6 + [str(rows), ""]])
+
+
+def measure(rows: int, latency: float, page_size: int):
+    """Returns:
+    (tuple): seconds, peak bytes, requests and records of one export."""
+    server = FakeSheets()
+    seed(server, rows, random.Random(0))
+    server.latency = latency
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = export.write_csv(Discard(), export.records(
+        server.spreadsheet, MONTH_NAMES, COLUMNS, Counter(), page_size))
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, sum(server.snapshot().values()), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=export.PAGE_SIZE)
+    args = parser.parse_args()
+
+    print(f"latency {args.latency * 1000:.0f} ms, "
+          f"{args.page_size} rows a page")
+    print(f"{'rows/month':>10} {'records':>9} {'ms':>8} {'peak KiB':>9} "
+          f"{'requests':>9}")
+    for rows in (args.rows, args.rows * 10):
+        seconds, peak, requests, count = measure(
+            rows, args.latency, args.page_size)
+        print(f"{rows:10} {count:9} {seconds * 1000:8.0f} "
+              f"{peak / 1024:9.0f} {requests:9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-cell cost of formatting and parsing a 10k-row column.
+
+Compares the previous per-call Currency('EUR') construction and the
+per-cell remove_formatting() parsing with format_many()/parse_many().
+
+Usage: python benchmarks/formatting.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from currencies import Currency  # noqa: E402
+from formatting import format_many, parse_many  # noqa: E402
+
+
+def old_format(expense):
+    """format_expenses() as it was: a new Currency per call."""
+    currency = Currency('EUR')
+    return currency.get_money_format(expense)
+
+
+def old_parse(exp_value):
+    """String branch of remove_formatting() as it was."""
+    neg_pos = exp_value[0]
+    if neg_pos == "-":
+        symbol = exp_value[1]
+        return float(exp_value.replace(",", "").replace(symbol, ""))
+    else:
+        return float(exp_value[1:].replace(",", ""))
+
+
+def per_cell(func, rows, repeat):
+    """Returns:
+    (float): best time per cell in microseconds."""
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    return best / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    values = [round(rng.uniform(-50, 2000), 2) for _ in range(args.rows)]
+    column = format_many(values)
+    assert parse_many(column) == [old_parse(cell) for cell in column]
+    assert parse_many(column) == values
+    assert column == [old_format(value) for value in values]
+
+    results = [
+        ("format", lambda: [old_format(value) for value in values],
+         lambda: format_many(values)),
+        ("parse", lambda: [old_parse(cell) for cell in column],
+         lambda: parse_many(column)),
+    ]
+    print(f"{'stage':8} {'old us/cell':>12} {'new us/cell':>12} "
+          f"{'speedup':>8}")
+    for name, old, new in results:
+        old_cost = per_cell(old, args.rows, args.repeat)
+        new_cost = per_cell(new, args.rows, args.repeat)
+        print(f"{name:8} {old_cost:12.3f} {new_cost:12.3f} "
+              f"{old_cost / new_cost:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
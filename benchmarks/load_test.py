@@ -0,0 +1,214 @@
+"""Load test of the expense flow against the fake Sheets server.
+
+Each simulated user goes through run.py's real prompt flow with
+scripted answers: pick a month, set or keep its budget, log a few
+expenses, upload and quit. All users share one FakeSheets instance, so
+latency, quota and injected 429s apply across them. Reports API
+requests per session by method and the wall time of each session.
+
+Users run one after another, each with a fresh run.Session, or
+--concurrency at a time in threads of their own, as the sessions of
+server.py do. Each thread answers its own user's prompts.
+
+At the end, each month's row count (N1) and running totals (H1:M1),
+and the totals of its rows, are checked against what the users who
+got through the flow logged; the test fails if any differ. Sessions
+that fail part-way may leave autosaved expenses behind, so the check is
+only exact when every session completes.
+
+With --limit, calls go through a RateLimiter at that many requests a
+second, which retries the 429s and reports its state at the end.
+
+Usage: python benchmarks/load_test.py [--users 20] [--expenses 3]
+       [--concurrency 1] [--latency 0.05] [--jitter 0.02] [--quota 300]
+       [--error-rate 0] [--limit 5] [--burst 10] [--backoff 0.2]
+"""
+import argparse
+import builtins
+import contextlib
+import contextvars
+import io
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ledger  # noqa: E402
+import run  # noqa: E402
+from aggregate import category_totals, expense_matrix  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+from money import Money  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+from storage import WrappedSpreadsheet  # noqa: E402
+
+# The answers of the user whose session runs in this thread.
+ANSWERS = threading.local()
+
+
+class Budget(str):
+    """Answer to the budget prompt: the amount, confirmed with "p", or
+    "u" if the month has a budget by the time the user gets there."""
+
+
+def answer(prompt=""):
+    """Stands in for input(), answering this thread's user's prompts.
+    Returns:
+        (str): the next answer."""
+    value = next(ANSWERS.answers)
+    if isinstance(value, Budget):
+        if "use existing" in prompt:
+            return "u"
+        ANSWERS.answers = itertools.chain(["p"], ANSWERS.answers)
+    return value
+
+
+def user_script(rng, expenses: int):
+    """Builds the answers one user types.
+    Returns:
+        (tuple): answers, in prompt order, the month's number, and the
+        cents logged in each column of the month."""
+    month = rng.randint(1, 12)
+    name = rng.choice(["Ana", "Ben", "Cara", "Dev", "Eli", "Fin"])
+    answers = [name, str(month), "p", Budget(rng.randint(500, 3000))]
+    cents = [0] * ledger.CATEGORIES
+    for number in range(expenses):
+        category, amount = rng.randint(1, 6), f"{rng.uniform(1, 200):.2f}"
+        # The prompts number the month's columns from 1.
+        cents[category - 1] += Money.parse(amount).cents
+        answers += [str(category), amount, "p"]
+        answers += ["a" if number < expenses - 1 else "c"]
+    return answers + ["u", "q"], month, cents
+
+
+def run_session(spreadsheet, answers: list):
+    """Runs run.py's flow once with fresh per-user state.
+    Returns:
+        (bool): whether the user got through every answer, rather than
+        the app giving up, e.g. on a 429."""
+    run.SESSION.set(run.Session(spreadsheet))
+    ANSWERS.answers = iter(answers)
+    try:
+        run.run_screens(run.ask_name)
+    finally:
+        run.end_session()
+    return next(ANSWERS.answers, None) is None
+
+
+def timed_session(spreadsheet, answers: list):
+    """Returns:
+    (tuple): seconds the session took, and the error it failed with,
+    "ended early" or None."""
+    start = time.perf_counter()
+    try:
+        failure = None if run_session(spreadsheet, answers) else (
+            "ended early")
+    except Exception as error:
+        failure = type(error).__name__
+    return time.perf_counter() - start, failure
+
+
+def check_months(server, logged: dict):
+    """Compares each month with what the users logged in it.
+    Args:
+        server (FakeSheets): The fake spreadsheet after the run.
+        logged (dict): Rows uploaded and cents per column, by month.
+    Returns:
+        (list): one line per month whose rows or totals differ."""
+    problems = []
+    for month, title in run.MONTHS.items():
+        rows, cents = logged.get(month, (0, [0] * ledger.CATEGORIES))
+        header = server.backend.read(title, 1, 1)[0]
+        totals, row_count = ledger.read_ledger(header) or (
+            [0] * ledger.CATEGORIES, 0)
+        expense_rows = server.backend.read(title, ledger.HEADER_ROWS + 1)
+        scanned = category_totals(
+            expense_matrix(expense_rows, ledger.CATEGORIES))
+        if (row_count, totals, scanned) != (rows, cents, cents):
+            problems.append(
+                f"{title}: logged {rows} rows {cents}, N1 {row_count} "
+                f"H1:M1 {totals}, rows add up to {scanned}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--expenses", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--quota", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=float, default=None)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--backoff", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = FakeSheets(args.latency, args.jitter, args.quota,
+                        args.error_rate, args.seed)
+    spreadsheet = server.spreadsheet
+    limiter = None
+    if args.limit:
+        limiter = RateLimiter(args.limit, args.burst, backoff=args.backoff,
+                              seed=args.seed)
+        spreadsheet = WrappedSpreadsheet(spreadsheet, limiter)
+    server.seed_months(run.MONTHS.values())
+    rng = random.Random(args.seed)
+    scripts = [user_script(rng, args.expenses) for _ in range(args.users)]
+    run.clear_terminal = lambda: None
+    real_input = builtins.input
+    builtins.input = answer
+    durations, failures = [], Counter()
+    logged = defaultdict(lambda: (0, [0] * ledger.CATEGORIES))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(
+                args.concurrency, "user") as pool:
+            # A fresh context each, as server.py gives its sessions.
+            sessions = [
+                pool.submit(contextvars.Context().run, timed_session,
+                            spreadsheet, answers)
+                for answers, _, _ in scripts]
+            for session, (_, month, cents) in zip(sessions, scripts):
+                seconds, failure = session.result()
+                if failure is not None:
+                    failures[failure] += 1
+                    continue
+                durations.append(seconds)
+                rows, totals = logged[month]
+                logged[month] = (rows + 1, [
+                    total + value for total, value in zip(totals, cents)])
+    finally:
+        builtins.input = real_input
+
+    calls = server.snapshot()
+    sessions = len(durations) + sum(failures.values())
+    print(f"sessions: {sessions}  completed: {len(durations)}  "
+          f"failed: {dict(failures) or 0}  429s: {server.errors}")
+    print(f"requests per session: {sum(calls.values()) / sessions:.1f}")
+    for method, count in calls.most_common():
+        print(f"  {method:22} {count / sessions:6.2f}")
+    if durations:
+        durations.sort()
+        p95 = durations[int(0.95 * (len(durations) - 1))]
+        print(f"session wall time: mean {statistics.mean(durations):.3f}s  "
+              f"p50 {statistics.median(durations):.3f}s  p95 {p95:.3f}s")
+    if limiter is not None:
+        print(f"rate limiter: {limiter.state()}")
+    problems = check_months(server, logged)
+    print(f"months matching what was logged: {12 - len(problems)}/12")
+    for problem in problems:
+        print(f"  ❌ {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
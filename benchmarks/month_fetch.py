@@ -0,0 +1,119 @@
+"""Wall time of reading a month's state against a slow fake Sheets.
+
+Compares reading the month worksheet, its budget, remainder and running
+totals and then the Overview worksheet one after another with
+fetch_month(), which opens Overview while the month is read, and with
+prefetch_month() started while the user takes --think seconds to
+confirm the month; its time is the wait left after confirming. "warm
+start" is fetch_month() in a new process that finds the month's
+snapshot from an earlier run (see snapshot). Runs against FakeSheets
+with injected latency, for a month that keeps its running totals and
+for an older one that has to be scanned.
+
+Usage: python benchmarks/month_fetch.py [--latency 0.1] [--repeat 5]
+       [--think 0.5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ledger  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+from fetch import fetch_month, prefetch_month  # noqa: E402
+from sheet_cache import SheetCache  # noqa: E402
+import snapshot  # noqa: E402
+from write_buffer import WriteBuffer  # noqa: E402
+
+
+def sequential(cache, spreadsheet, title: str):
+    """The reads of the budget and summary screens, one at a time."""
+    worksheet = cache.worksheet(spreadsheet, title)
+    cache.cell(worksheet, "B1")
+    cache.cell(worksheet, "F1")
+    ledger.load_totals(cache, worksheet)
+    cache.worksheet(spreadsheet, "Overview")
+
+
+def prefetched(think: float):
+    """Returns:
+    a function prefetching a month and waiting think seconds for the
+    user, returning when they confirmed."""
+    def fetch(cache, spreadsheet, title: str):
+        future = prefetch_month(cache, spreadsheet, title)
+        time.sleep(think)
+        confirmed = time.perf_counter()
+        future.result()
+        return confirmed
+
+    return fetch
+
+
+def warm_start(folder: str):
+    """Returns:
+    fetch_month(), with the snapshots kept in folder."""
+    def fetch(cache, spreadsheet, title: str):
+        os.environ["TAG_TRACK_SNAPSHOTS"] = folder
+        try:
+            fetch_month(cache, spreadsheet, title)
+        finally:
+            os.environ["TAG_TRACK_SNAPSHOTS"] = ""
+
+    return fetch
+
+
+def timed(func, server, title: str, repeat: int):
+    """Returns:
+    (tuple): median seconds and requests per call."""
+    durations = []
+    before = sum(server.snapshot().values())
+    for _ in range(repeat):
+        # A fresh cache each time, as for a new session.
+        cache = SheetCache(WriteBuffer())
+        start = time.perf_counter()
+        result = func(cache, server.spreadsheet, title)
+        if isinstance(result, float):
+            start = result
+        durations.append(time.perf_counter() - start)
+    requests = (sum(server.snapshot().values()) - before) / repeat
+    return statistics.median(durations), requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--think", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = FakeSheets(args.latency)
+    server.seed_months(["January", "February"])
+    # January keeps running totals; February predates them.
+    server.backend.write(
+        "January", ledger.LEDGER_RANGE,
+        [ledger.ledger_values([0] * ledger.CATEGORIES, 0, None)])
+    # Only "warm start" finds snapshots.
+    os.environ["TAG_TRACK_SNAPSHOTS"] = ""
+
+    print(f"latency {args.latency * 1000:.0f} ms per request")
+    print(f"{'month':10} {'method':12} {'wall ms':>8} {'requests':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for title in ("January", "February"):
+            # The earlier run leaving the snapshot behind.
+            warm_start(folder)(SheetCache(WriteBuffer()), server.spreadsheet,
+                               title)
+            for name, func in (("sequential", sequential),
+                               ("concurrent", fetch_month),
+                               ("prefetched", prefetched(args.think)),
+                               ("warm start", warm_start(folder))):
+                seconds, requests = timed(func, server, title, args.repeat)
+                print(f"{title:10} {name:12} {seconds * 1000:8.0f} "
+                      f"{requests:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
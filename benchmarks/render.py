@@ -0,0 +1,113 @@
+"""Cost of drawing the app's screens, before and after render.py.
+
+Times clearing the screen with `clear` in a subprocess against ANSI
+escapes, text2art on every banner against the cached one, PrettyTable
+menus against render.menu(), and the summary table built with
+PrettyTable against render.table().
+
+Usage: python benchmarks/render.py [--repeat 200]
+"""
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render  # noqa: E402
+from run import EXPENSES, MONTHS  # noqa: E402
+from termcolor import colored  # noqa: E402
+
+
+def old_clear():
+    subprocess.run(["clear"], stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+
+
+def old_banner():
+    from art import text2art
+    from colorama import Fore
+
+    return Fore.LIGHTGREEN_EX + text2art("$ Tag - Track") + Fore.RESET
+
+
+def old_menu(value, heading, colour="light_green"):
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [colored("No.", colour), colored(heading, colour)]
+    for num, parameter in value.items():
+        table.add_row([colored(num, "white"), colored(parameter, "white")])
+        table.align = "l"
+    return str(table)
+
+
+SUMMARY = [
+    [("Groceries", "white"), ("€12.50", "white")],
+    [("Rent", "white"), ("€500.00", "white")],
+    [("-----------------------", None)] * 2,
+] + [
+    [(f"Past '{name}' Tags:", "light_yellow"), ("€1,234.00", "light_yellow")]
+    for name in EXPENSES.values()
+] + [
+    [("-----------------------", None)] * 2,
+    [("Your remaining budget:", "green"), ("€250.00", "green")],
+]
+FIELDS = [("Expenses for March", "light_green"),
+          ("March's budget: €1,000.00", "light_green")]
+
+
+def old_summary():
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = [render.paint(*cell) for cell in FIELDS]
+    for row in SUMMARY:
+        table.add_row([render.paint(*cell) for cell in row])
+    table.align = "l"
+    return str(table)
+
+
+def new_summary():
+    return render.table(FIELDS, SUMMARY)
+
+
+def per_call(func, repeat: int):
+    """Returns:
+    (float): best time per call in microseconds."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = min(timeit.repeat(func, number=repeat, repeat=3))
+    return best / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    assert old_summary() == new_summary(), "summary tables differ"
+    items = tuple(MONTHS.items())
+    assert old_menu(MONTHS, "Month") == render.menu(
+        items, "Month", "light_green"), "menus differ"
+
+    cases = [
+        ("clear", old_clear, render.clear),
+        ("banner", old_banner, render.banner),
+        ("month menu", lambda: old_menu(MONTHS, "Month"),
+         lambda: render.menu(items, "Month", "light_green")),
+        ("summary table", old_summary, new_summary),
+    ]
+    print(f"{'':14} {'before µs':>10} {'after µs':>10}")
+    for name, old, new in cases:
+        # A subprocess per call: fewer of them will do.
+        repeat = args.repeat
+        if old is old_clear:
+            repeat = max(1, repeat // 10)
+        print(f"{name:14} {per_call(old, repeat):10.1f} "
+              f"{per_call(new, args.repeat):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Time to first prompt of run.py.
+
+Starts run.py in a subprocess and waits for the name prompt. Also times
+what the app used to do before printing anything: importing gspread and
+google-auth and, when --creds is given, authorizing and opening the
+spreadsheet.
+
+Usage: python benchmarks/startup.py [--runs 5] [--creds creds.json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = b"Please tell me your name"
+
+
+def time_to_prompt():
+    """Returns:
+    (float): seconds from process start until the name prompt."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-u", "run.py"],
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=dict(os.environ, TERM="dumb"),
+    )
+    output = b""
+    try:
+        while PROMPT not in output:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("run.py exited before asking a name")
+            output += chunk
+        return time.perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def time_eager_imports():
+    """Returns:
+    (float): seconds to import the modules run.py used to load first."""
+    code = (
+        "import time; start = time.perf_counter(); import gspread; "
+        "from google.oauth2.service_account import Credentials; "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True)
+    return float(result.stdout)
+
+
+def time_connect(creds_file: str):
+    """Returns:
+    (float): seconds to authorize and open the Tag-Track spreadsheet."""
+    sys.path.insert(0, ROOT)
+    from sheets_client import open_spreadsheet
+
+    start = time.perf_counter()
+    open_spreadsheet("Tag-Track", creds_file)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--creds", help="service account file to time "
+                        "the connection that used to block startup")
+    args = parser.parse_args()
+
+    prompt = statistics.median(time_to_prompt() for _ in range(args.runs))
+    imports = statistics.median(
+        time_eager_imports() for _ in range(args.runs))
+    print(f"time to first prompt:          {prompt * 1000:8.1f} ms")
+    print(f"deferred gspread/google-auth:  {imports * 1000:8.1f} ms")
+    if args.creds:
+        connect = time_connect(args.creds)
+        print(f"deferred authorize + open:     {connect * 1000:8.1f} ms")
+        imports += connect
+    print(f"previous time to first prompt: "
+          f"{(prompt + imports) * 1000:8.1f} ms (estimated)")
+
+
+if __name__ == "__main__":
+    main()
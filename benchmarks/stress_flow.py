@@ -0,0 +1,85 @@
+"""Logs many expenses in one session and tracks stack depth and memory.
+
+Drives run.py's prompt flow with scripted answers against FakeSheets:
+one month, one budget, then --expenses expenses added one after
+another before a single upload. At every prompt it records the Python
+stack depth, and every --every expenses the traced memory. With the
+screens returned to run_screens() instead of called, the stack depth
+stays constant; memory only grows by the stored expenses themselves.
+
+Usage: python benchmarks/stress_flow.py [--expenses 10000] [--every 1000]
+"""
+import argparse
+import builtins
+import contextlib
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+
+
+def stack_depth():
+    """Returns:
+    (int): number of frames on the current stack."""
+    depth, frame = 0, sys._getframe()
+    while frame is not None:
+        depth, frame = depth + 1, frame.f_back
+    return depth
+
+
+def answers(expenses: int):
+    """Yields the answers for one long session."""
+    yield from ["Ana", "3", "p", "100000", "p"]
+    for number in range(expenses):
+        yield from [str(number % 6 + 1), "1.25", "p"]
+        yield "a" if number < expenses - 1 else "c"
+    yield from ["u", "q"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=10000)
+    parser.add_argument("--every", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = FakeSheets()
+    server.seed_months(run.MONTHS.values())
+    run.SESSION.set(run.Session(server.spreadsheet))
+    run.clear_terminal = lambda: None
+
+    depths, samples = set(), []
+    scripted = answers(args.expenses)
+
+    def scripted_input(prompt=""):
+        depths.add(stack_depth())
+        logged = len(run.retrieve_expenses())
+        sampled = samples and samples[-1][0] == logged
+        if logged and logged % args.every == 0 and not sampled:
+            samples.append((logged, tracemalloc.get_traced_memory()[0]))
+        return next(scripted)
+
+    real_input = builtins.input
+    builtins.input = scripted_input
+    tracemalloc.start()
+    try:
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                run.run_screens(run.ask_name)
+    finally:
+        builtins.input = real_input
+        tracemalloc.stop()
+
+    print(f"expenses logged: {args.expenses}")
+    print(f"stack depth at prompts: min {min(depths)}  max {max(depths)}")
+    print(f"{'expenses':>9} {'traced KiB':>11}")
+    for logged, size in samples:
+        print(f"{logged:9} {size / 1024:11.1f}")
+    print(f"remote row: {server.backend.read('March', 3, 3)[0]}")
+
+
+if __name__ == "__main__":
+    main()
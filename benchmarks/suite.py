@@ -0,0 +1,298 @@
+"""Benchmark suite of the expense pipeline, with saved baselines.
+
+Stages: check_list(), sum_prev_exps(), format_expenses(),
+remove_formatting() and calculate_budget_remainder(), each run on a
+synthetic month of every --sizes rows. The month is held in memory by
+MemorySheet, so the timings are the app's own work. The sheet has no
+running totals, so sum_prev_exps() and calculate_budget_remainder() read
+and add up every row, as for an older sheet on its first session. Each
+stage reports the best time of --repeat runs, which varies least from
+one run of the suite to the next, rows per second and the requests it
+made.
+
+Flows: whole user flows against FakeSheets, with the requests of each
+by method. Autosave is off, as how many of its writes go out depends on
+timing; see benchmarks/autosave.py for it.
+
+    python benchmarks/suite.py --save baseline.json
+    python benchmarks/suite.py --compare baseline.json
+
+--compare reports stages slower than the baseline by more than
+--tolerance and flows making more requests, and exits with status 1 if
+there are any. Request counts are exact; timings only compare on the
+same machine with nothing else running.
+
+Usage: python benchmarks/suite.py [--sizes 100,10000,1000000]
+       [--repeat 5] [--save FILE] [--compare FILE] [--tolerance 0.2]
+"""
+import argparse
+import builtins
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+import export  # noqa: E402
+import report  # noqa: E402
+import run  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+from formatting import format_expenses  # noqa: E402
+from money import Money  # noqa: E402
+
+MONTH = "March"
+
+
+class MemorySheet:
+    """A month worksheet held in memory, with the requests SheetCache
+    makes of it. It is its own spreadsheet."""
+
+    def __init__(self, title: str, rows: list):
+        self.id = "memory"
+        self.title = title
+        self.rows = rows
+        self.spreadsheet = self
+        self.calls = Counter()
+
+    def row_values(self, row: int):
+        self.calls["row_values"] += 1
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def values_batch_get(self, ranges: list, params=None):
+        from gspread.utils import a1_range_to_grid_range
+
+        self.calls["values_batch_get"] += 1
+        value_ranges = []
+        for name in ranges:
+            grid = a1_range_to_grid_range(name.split("!")[-1])
+            rows = self.rows[grid.get("startRowIndex", 0):
+                             grid.get("endRowIndex")]
+            value_range = {"range": name}
+            if rows:
+                value_range["values"] = rows
+            value_ranges.append(value_range)
+        return {"valueRanges": value_ranges}
+
+
+def month_rows(size: int, rng):
+    """Returns:
+    (list): the header rows and size expense rows, a third of the cells
+    empty. 1000 distinct rows are repeated, as building a million takes
+    longer than the stages."""
+    pattern = []
+    for _ in range(min(size, 1000)):
+        cents = [rng.randint(1, 50000) if rng.random() > 1 / 3 else None
+                 for _ in range(6)]
+        pattern.append(["" if value is None else format_expenses(
+            Money(value)) for value in cents])
+    header = ["Budget:", "€1,000,000.00", "", "", "Remaining:", "€0.00"]
+    rows = [header, list(run.EXPENSES.values())]
+    return rows + [pattern[index % len(pattern)] for index in range(size)]
+
+
+def start_session(sheet):
+    """Starts a session on the sheet's month, as after ask_month().
+    Returns: None."""
+    run.SESSION.set(run.Session(sheet))
+    run.update_month(3)
+    run.update_gsheet(sheet)
+    run.update_budget(Money.parse(sheet.rows[0][1]))
+
+
+def stage_timings(size: int, repeat: int, rng):
+    """Returns:
+    (dict): milliseconds, rows per second and requests of each stage,
+    keyed "stage@size"."""
+    sheet = MemorySheet(MONTH, month_rows(size, rng))
+    cells = [cell for row in sheet.rows[2:] for cell in row if cell]
+    amounts = [Money.parse(cell) for cell in cells[:size]]
+    categories = list(run.EXPENSES.values())
+    logged = [[categories[index % 6], amount]
+              for index, amount in enumerate(amounts)]
+
+    def fresh():
+        start_session(sheet)
+
+    def expenses_list():
+        fresh()
+        run.replace_expenses(list(logged))
+
+    def expenses_dict():
+        fresh()
+        run.replace_expenses({category: Money(1250)
+                              for category in categories})
+
+    stages = {
+        "check_list": (run.check_list, expenses_list),
+        "sum_prev_exps": (run.sum_prev_exps, fresh),
+        "format_expenses": (
+            lambda: [format_expenses(amount) for amount in amounts], fresh),
+        "remove_formatting": (
+            lambda: [run.remove_formatting(cell) for cell in cells[:size]],
+            fresh),
+        "calculate_budget_remainder": (
+            run.calculate_budget_remainder, expenses_dict),
+    }
+    # Small sheets are timed over several calls, each after its setup.
+    number = max(1, 10 ** 4 // size)
+    results = {}
+    for name, (func, setup) in stages.items():
+        times = []
+        for _ in range(repeat):
+            total = 0
+            for _ in range(number):
+                setup()
+                sheet.calls.clear()
+                # As timeit does, so a collection does not land in a run.
+                gc.disable()
+                start = time.perf_counter()
+                func()
+                total += time.perf_counter() - start
+                gc.enable()
+            times.append(total / number)
+        seconds = min(times)
+        results[f"{name}@{size}"] = {
+            "ms": round(seconds * 1000, 3),
+            "rows_per_s": round(size / seconds) if seconds else None,
+            "requests": sum(sheet.calls.values()),
+        }
+    return results
+
+
+def prompts(server, answers: list):
+    """Runs run.py's prompt flow once with a fresh session.
+    Returns: None."""
+    run.SESSION.set(run.Session(server.spreadsheet))
+    answers = iter(answers)
+    builtins.input = lambda prompt="": next(answers)
+    run.run_screens(run.ask_name)
+    run.end_session()
+
+
+def command(server, argv: list):
+    """Runs a cli.py command on the fake spreadsheet.
+    Returns: None."""
+    app = argparse.Namespace(**vars(run))
+    app.SHEET = server.spreadsheet
+    server.spreadsheet.start = server.spreadsheet.close = lambda: None
+    cli.main(argv, app)
+
+
+def flow_calls():
+    """Returns:
+    (dict): requests by method of each flow, in the order they run on
+    one sheet."""
+    server = FakeSheets()
+    server.seed_months(run.MONTHS.values())
+    months = list(run.MONTHS.values())
+    expense = ["2", "12.50", "p", "c", "u", "q"]
+    flows = {
+        "first session": lambda: prompts(
+            server, ["Ana", "3", "p", "1000", "p"] + expense),
+        "next session": lambda: prompts(
+            server, ["Ana", "3", "p", "u"] + expense),
+        "cli add": lambda: command(
+            server, ["add", "--month", "3", "Groceries", "5", "Rent", "9"]),
+        "year report": lambda: report.fetch_year(server.spreadsheet, months),
+        "export": lambda: sum(1 for _ in export.records(
+            server.spreadsheet, months, run.COLUMNS, Counter())),
+    }
+    results = {}
+    for name, flow in flows.items():
+        before = server.snapshot()
+        flow()
+        calls = server.snapshot()
+        calls.subtract(before)
+        results[name] = dict(sorted((+calls).items()))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Prints what changed since the baseline.
+    Returns:
+        (int): number of regressions."""
+    regressions = 0
+    print(f"\ncompared with the baseline ({baseline['python']})")
+    for key, now in results["stages"].items():
+        then = baseline["stages"].get(key)
+        if then is None or not then["ms"]:
+            continue
+        change = now["ms"] / then["ms"] - 1
+        slower = change > tolerance
+        more = now["requests"] > then["requests"]
+        regressions += slower or more
+        mark = "❌" if slower or more else "  "
+        print(f"{mark} {key:40} {then['ms']:10.1f} -> {now['ms']:10.1f} ms "
+              f"{change:+7.0%}  requests {then['requests']} -> "
+              f"{now['requests']}")
+    for name, now in results["flows"].items():
+        then = baseline["flows"].get(name)
+        if then is None:
+            continue
+        more = sum(now.values()) > sum(then.values())
+        regressions += more
+        if now != then:
+            print(f"{'❌' if more else '  '} {name:40} {then} -> {now}")
+    print(f"{regressions} regression(s), tolerance {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,10000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    os.environ["TAG_TRACK_SNAPSHOTS"] = tempfile.mkdtemp(prefix="suite-")
+    run.clear_terminal = lambda: None
+    autosave_expenses = run.autosave_expenses
+    real_input = builtins.input
+    rng = random.Random(args.seed)
+    results = {"python": platform.python_version(), "stages": {}}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for size in sizes:
+                results["stages"].update(
+                    stage_timings(size, args.repeat, rng))
+            run.autosave_expenses = lambda: None
+            results["flows"] = flow_calls()
+    finally:
+        run.autosave_expenses = autosave_expenses
+        builtins.input = real_input
+
+    print(f"{'stage':40} {'ms':>10} {'rows/s':>12} {'requests':>9}")
+    for key, stage in results["stages"].items():
+        rate = stage["rows_per_s"] or 0
+        print(f"{key:40} {stage['ms']:10.1f} {rate:12,} "
+              f"{stage['requests']:9}")
+    print(f"\n{'flow':20} requests by method")
+    for name, calls in results["flows"].items():
+        print(f"{name:20} {sum(calls.values()):3}  {calls}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nresults saved to {args.save}")
+    if baseline is not None and compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Requests and wall time of a year report against a slow fake Sheets.
+
+Compares opening each month worksheet in turn and reading it whole with
+report.fetch_year(), which uses one values batch_get for the first rows
+and at most one more for months without running totals. Half of the
+months keep running totals.
+
+Usage: python benchmarks/year_report.py [--latency 0.1] [--rows 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ledger  # noqa: E402
+import report  # noqa: E402
+from aggregate import category_totals, expense_matrix  # noqa: E402
+from fake_sheets import FakeSheets  # noqa: E402
+from formatting import format_many  # noqa: E402
+from run import MONTHS  # noqa: E402
+
+MONTH_NAMES = list(MONTHS.values())
+
+
+def one_by_one(spreadsheet):
+    """The year read the only way the app could before: each month and
+    then Overview, one request after another."""
+    totals = []
+    for month in MONTH_NAMES:
+        rows = spreadsheet.worksheet(month).get_all_values()
+        matrix = expense_matrix(rows[ledger.HEADER_ROWS:], ledger.CATEGORIES)
+        totals.append(category_totals(matrix))
+    spreadsheet.worksheet("Overview").get_all_values()
+    return totals
+
+
+def seed(server, rows: int, rng):
+    """Fills every month with rows of expenses; even months get running
+    totals."""
+    server.seed_months(MONTH_NAMES)
+    for number, month in enumerate(MONTH_NAMES):
+        cents = [[rng.randint(0, 20000) for _ in range(6)]
+                 for _ in range(rows)]
+        values = [format_many(value / 100 for value in row) for row in cents]
+        server.backend.write(month, f"A3:F{rows + 2}", values)
+        if number % 2:
+            totals = [str(sum(column)) for column in zip(*cents)]
+            server.backend.write(month, ledger.LEDGER_RANGE,
+                                 [totals + [str(rows)]])
+
+
+def measure(server, func):
+    """Returns:
+    (tuple): seconds, requests and the result of func."""
+    before = sum(server.snapshot().values())
+    start = time.perf_counter()
+    result = func(server.spreadsheet)
+    seconds = time.perf_counter() - start
+    return seconds, sum(server.snapshot().values()) - before, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    server = FakeSheets(args.latency)
+    seed(server, args.rows, random.Random(0))
+    old_seconds, old_requests, old_totals = measure(server, one_by_one)
+    new_seconds, new_requests, year = measure(
+        server, lambda spreadsheet: report.fetch_year(
+            spreadsheet, MONTH_NAMES))
+    assert year.totals == old_totals, "totals differ"
+    print(f"latency {args.latency * 1000:.0f} ms, {args.rows} rows a month")
+    print(f"one by one   {old_seconds * 1000:7.0f} ms  "
+          f"{old_requests:3} requests")
+    print(f"fetch_year   {new_seconds * 1000:7.0f} ms  "
+          f"{new_requests:3} requests")
+
+
+if __name__ == "__main__":
+    main()
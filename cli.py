@@ -0,0 +1,299 @@
+"""Logs expenses from the command line, without the prompts.
+
+    python3 run.py add [--month 3] Groceries 12.50 [Rent 500 ...]
+    python3 run.py import expenses.csv [--dry-run]
+
+Each CSV line is month,category,amount, e.g. "3,Groceries,12.50" or
+"March,groceries,€12.50"; a header line is skipped. Months are given
+by number or name, categories by their number in the month's menu or
+by the name the month sheet gives them in its second row. Every value
+is checked with the validate_* rules of the prompts, and nothing is
+written if any fails.
+
+Like an upload from the prompts, expenses are merged per month and
+category (see check_list()), and each month gets one new row, its
+running totals, remainder and Overview row. All months are read with
+report.fetch_year(). Each new row is added with a values append, so
+Sheets picks where it lands, and the rest is written in a single
+values batch_update.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import sys
+from collections import defaultdict
+from datetime import date
+import ledger
+from formatting import format_expenses
+from money import MAX_CENTS, Money
+import report
+from write_buffer import append_values, quoted, raw_values
+
+
+def quietly(rule, *args):
+    """Runs one of run.py's validate_* rules without it drawing on the
+    screen.
+    Returns:
+        (str): what the rule would have told the user, or None if the
+        value is valid."""
+    shown = io.StringIO()
+    with contextlib.redirect_stdout(shown):
+        valid = rule(*args)
+    if valid:
+        return None
+    text = shown.getvalue().replace("\033[2J\033[H", "")
+    return " ".join(text.replace("❌", "").replace("👉", "").split())
+
+
+def choice(app, value: str, options: dict, kind: str):
+    """Reads a month or category given by number or by name.
+    Args:
+        app (module): run.py.
+        value (str): The number or name.
+        options (dict): MONTHS or EXPENSES.
+        kind (str): "month" or "category", for messages.
+    Returns:
+        (int): number of the choice."""
+    value = value.strip()
+    names = {name.lower(): num for num, name in options.items()}
+    if value.lower() in names:
+        return names[value.lower()]
+    error = quietly(app.validate_selection, value, len(options))
+    if error:
+        raise ValueError(f"{kind} {value!r}: {error}")
+    return int(float(value))
+
+
+def amount(app, value: str):
+    """Returns:
+    (Money): the expense, checked like ask_expense() does."""
+    value = value.strip()
+    # Symbols and thousands separators as in the worksheets are fine.
+    plain = value.replace("€", "").replace(",", "")
+    error = quietly(app.validate_num_selection, plain)
+    if error:
+        raise ValueError(f"amount {value!r}: {error}")
+    try:
+        parsed = Money.parse(value)
+    except ValueError:
+        raise ValueError(f"amount {value!r}: not a single, finite number")
+    if not parsed.in_range():
+        raise ValueError(f"amount {value!r}: more than "
+                         f"{format_expenses(Money(MAX_CENTS))}")
+    return parsed
+
+
+class Batch:
+    """Expenses merged per month and category, in cents.
+    Args:
+        app (module): run.py."""
+
+    def __init__(self, app):
+        self.app = app
+        # Month -> column number or category name -> cents.
+        self.cents = defaultdict(lambda: defaultdict(int))
+        self.counts = defaultdict(int)
+
+    def category(self, value: str):
+        """Reads a category given by number, as the prompts number the
+        month's columns, or by name. Both are checked against the
+        month's columns once its sheet is read, see data().
+        Returns:
+            (int): number of the column, from 1, or (str): the name."""
+        value = value.strip()
+        if value:
+            try:
+                float(value)
+            except ValueError:
+                return value
+        return choice(self.app, value, self.app.EXPENSES, "category")
+
+    def add(self, month: str, category: str, value: str):
+        """Checks and adds one expense.
+        Returns: None."""
+        month = choice(self.app, month, self.app.MONTHS, "month")
+        category = self.category(category)
+        self.cents[month][category] += amount(self.app, value).cents
+        self.counts[month] += 1
+
+    def read_csv(self, file):
+        """Adds every line of a month,category,amount CSV file.
+        Returns:
+            (list): "line N: problem" for each line that was invalid."""
+        errors = []
+        for line, fields in enumerate(csv.reader(file), 1):
+            if not fields or not "".join(fields).strip():
+                continue
+            if len(fields) != 3:
+                errors.append(f"line {line}: expected month,category,"
+                              f"amount, got {len(fields)} fields")
+                continue
+            try:
+                self.add(*fields)
+            except ValueError as error:
+                # A header line names the columns instead.
+                if line == 1 and fields[0].strip().lower() == "month":
+                    continue
+                errors.append(f"line {line}: {error}")
+        return errors
+
+    def rows(self, year):
+        """Works out the new row of every month in the batch.
+        Args:
+            year (YearReport): The sheet as it is, from fetch_year().
+        Returns:
+            (dict): (cents per category, row values) by month number.
+        Raises:
+            ValueError: A month sheet has no column for a category."""
+        rows = {}
+        for month, named in sorted(self.cents.items()):
+            title = self.app.MONTHS[month]
+            columns = year.columns[month - 1] or self.app.COLUMNS
+            found = {name.lower(): column for name, column in columns.items()}
+            cents = [0] * ledger.CATEGORIES
+            for category, value in named.items():
+                if isinstance(category, int):
+                    if category > len(columns):
+                        raise ValueError(
+                            f"{title} has {len(columns)} categories, "
+                            f"not {category}")
+                    cents[category - 1] += value
+                elif category.lower() in found:
+                    cents[found[category.lower()]] += value
+                else:
+                    raise ValueError(f"{title} has no {category!r} column")
+            rows[month] = cents, [format_expenses(Money(value)) if value
+                                  else "" for value in cents[:len(columns)]]
+        return rows
+
+    def data(self, year, rows: dict, added=True):
+        """Works out the writes for every month in the batch but its new
+        row: running totals, remainder and Overview row.
+        Args:
+            year (YearReport): The sheet, from fetch_year().
+            rows (dict): The new rows, from rows().
+            added (bool): Whether year was read before the new rows
+                were appended, so their cents are still to be added.
+        Returns:
+            (list): values batch_update data."""
+        data = []
+        for month, (cents, _) in rows.items():
+            index = month - 1
+            title = self.app.MONTHS[month]
+            totals = year.totals[index]
+            row_count = year.row_counts[index]
+            checksum = year.checksums[index]
+            if added:
+                totals = [old + new for old, new in zip(totals, cents)]
+                row_count += 1
+                checksum = ledger.row_checksum(cents)
+            data.append({
+                "range": quoted(title, ledger.LEDGER_RANGE),
+                "values": raw_values(
+                    [ledger.ledger_values(totals, row_count, checksum)]),
+            })
+            budget = year.budgets[index]
+            if budget is not None:
+                remainder = budget - Money(sum(totals))
+                data.append({"range": quoted(title, "F1"),
+                             "values": [[format_expenses(remainder)]]})
+            overview = [format_expenses(Money(total)) for total in totals]
+            # The month's Overview row, as expensive_battleships() has it.
+            data.append({
+                "range": quoted(
+                    "Overview", f"B{month + 1}:G{month + 1}"),
+                "values": raw_values([overview]),
+            })
+        return data
+
+    def summary(self):
+        """Returns:
+        (list): one line per month: expenses and amount added."""
+        return [
+            f" ✅  {self.app.MONTHS[month]}: {self.counts[month]} "
+            f"expense(s), {format_expenses(Money(sum(cents.values())))}"
+            for month, cents in sorted(self.cents.items())
+        ]
+
+
+def upload(app, batch, dry_run=False):
+    """Writes a batch with one read of the spreadsheet, one values
+    append per month and one values batch_update. If others appended
+    rows to a month since it was read, the months are read again, so
+    the totals count those rows too.
+    Returns: None."""
+    months = list(app.MONTHS.values())
+    year = report.fetch_year(app.SHEET, months)
+    rows = batch.rows(year)
+    if dry_run:
+        print("\n".join(batch.summary()))
+        ranges = len(rows) + len(batch.data(year, rows))
+        print(f" 👉  Dry run: {ranges} ranges not written.")
+        return
+    moved = False
+    for month, (_, values) in rows.items():
+        row = append_values(
+            app.SHEET, app.MONTHS[month], raw_values([values])[0])
+        expected = ledger.HEADER_ROWS + year.row_counts[month - 1] + 1
+        moved = moved or row != expected
+    if moved:
+        year = report.fetch_year(app.SHEET, months)
+    app.SHEET.values_batch_update(body={
+        "valueInputOption": "USER_ENTERED",
+        "data": batch.data(year, rows, added=not moved)})
+    print("\n".join(batch.summary()))
+
+
+def main(argv: list, app):
+    """Runs a command.
+    Args:
+        argv (list): Command-line arguments, without the program.
+        app (module): run.py, for its MONTHS, EXPENSES, COLUMNS,
+            validate_* rules and SHEET.
+    Returns:
+        (int): exit status."""
+    parser = argparse.ArgumentParser(
+        prog="run.py", description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="log expenses for one month")
+    add.add_argument("--month", default=str(date.today().month))
+    add.add_argument("expenses", nargs="+", metavar="CATEGORY AMOUNT")
+    add.add_argument("--dry-run", action="store_true")
+    load = commands.add_parser("import", help="log expenses from a CSV")
+    load.add_argument("file", type=argparse.FileType(encoding="utf-8"))
+    load.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    batch = Batch(app)
+    if args.command == "add":
+        if len(args.expenses) % 2:
+            parser.error("expected CATEGORY AMOUNT pairs")
+        errors = []
+        pairs = zip(args.expenses[::2], args.expenses[1::2])
+        for category, value in pairs:
+            try:
+                batch.add(args.month, category, value)
+            except ValueError as error:
+                errors.append(str(error))
+    else:
+        with args.file:
+            errors = batch.read_csv(args.file)
+    if errors:
+        print("\n".join(f" ❌  {error}" for error in errors),
+              file=sys.stderr)
+        print(" 👉  Nothing was written.", file=sys.stderr)
+        return 1
+    if not batch.cents:
+        print(" 👉  No expenses to log.")
+        return 0
+    app.SHEET.start()
+    try:
+        upload(app, batch, args.dry_run)
+    except ValueError as error:
+        print(f" ❌  {error}", file=sys.stderr)
+        print(" 👉  Nothing was written.", file=sys.stderr)
+        return 1
+    finally:
+        app.SHEET.close()
+    return 0
@@ -1,5 +1,6 @@
 const Pty = require('node-pty');
 const fs = require('fs');
+const net = require('net');
 
 exports.install = function () {
 
@@ -15,6 +16,29 @@ function socket() {
 
     this.on('open', function (client) {
 
+        // Join a running server.py ("host:port") instead of spawning.
+        if (process.env.TAG_TRACK_SERVER) {
+            const [host, port] = process.env.TAG_TRACK_SERVER.split(':');
+            const conn = net.connect(Number(port), host);
+            conn.setEncoding('utf8');
+            client.tty = {
+                write: function (data) { conn.write(data); },
+                kill: function () { conn.destroy(); }
+            };
+            conn.on('data', function (data) {
+                client.send(data);
+            });
+            conn.on('close', function () {
+                client.tty = null;
+                client.close();
+                console.log("Session ended");
+            });
+            conn.on('error', function (err) {
+                console.log('Server connection error: ', err);
+            });
+            return;
+        }
+
         // Spawn terminal
         client.tty = Pty.spawn('python3', ['run.py'], {
             name: 'xterm-color',
@@ -0,0 +1,198 @@
+"""Every logged expense of the year, as CSV or JSON Lines.
+
+    python3 export.py                           CSV to standard output
+    python3 export.py -o expenses.jsonl.gz      JSON Lines, gzip-compressed
+    python3 export.py -o year.csv --page-size 1000
+
+One record per expense cell: month, row, category and amount, e.g.
+"March,7,Groceries,12.50". Amounts are parsed as remove_formatting()
+does and written without the currency symbol. Category names come from
+each month sheet's second header row.
+
+The header rows of all months are read in one values batch_get. Each
+month is then read in pages of --page-size rows, and the next page is
+requested while the current one is written. At most two pages are held
+in memory, however many rows the sheets hold. A file is only put in
+place once all of it is written.
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from collections import Counter
+from contextvars import copy_context
+from fetch import POOL
+import ledger
+from money import Money
+import report
+from write_buffer import quoted
+
+PAGE_SIZE = 500
+FIELDS = ["month", "row", "category", "amount"]
+
+
+def pages(spreadsheet, title: str, covered: int, page_size=PAGE_SIZE):
+    """Reads a month's expense rows a page at a time.
+    Args:
+        spreadsheet (Spreadsheet): The Tag-Track spreadsheet.
+        title (str): Name of the month worksheet.
+        covered (int): Rows the month's running totals cover. Reading
+            goes on past empty pages until then.
+        page_size (int): Rows per request.
+    Yields:
+        (tuple): number of the page's first row, and its rows."""
+    def read(start: int):
+        end = start + page_size - 1
+        range_name = f"A{start}:{ledger.LAST_COLUMN}{end}"
+        return report.batch_get(
+            spreadsheet, [quoted(title, range_name)])[0]
+
+    start = ledger.HEADER_ROWS + 1
+    last_covered = ledger.HEADER_ROWS + covered
+    page = POOL.submit(copy_context().run, read, start)
+    while page is not None:
+        rows = page.result()
+        following = start + page_size
+        # Empty rows at the end of a page are left out of it: a short
+        # page ends the sheet, unless the running totals cover more.
+        page = None
+        if len(rows) == page_size or following <= last_covered:
+            page = POOL.submit(copy_context().run, read, following)
+        yield start, rows
+        start = following
+
+
+def records(spreadsheet, months: list, default: dict, skipped: Counter,
+            page_size=PAGE_SIZE):
+    """Streams the expenses of every month, in order.
+    Args:
+        spreadsheet (Spreadsheet): The Tag-Track spreadsheet.
+        months (list): Names of the month worksheets, in order.
+        default (dict): Columns of months whose second row names no
+            categories, as ledger.column_index() maps them.
+        skipped (Counter): Counts cells that are not amounts, by month.
+        page_size (int): Rows per request.
+    Yields:
+        (dict): month, row, category and amount of one expense."""
+    headers = report.batch_get(
+        spreadsheet, [quoted(month, ledger.HEADER_RANGE)
+                      for month in months])
+    for title, rows in zip(months, headers):
+        found = ledger.read_ledger(rows[0] if rows else [])
+        covered = found[1] if found else 0
+        names = list(ledger.column_index(
+            tuple(rows[1] if len(rows) > 1 else [])) or default)
+        for start, page in pages(spreadsheet, title, covered, page_size):
+            for number, row in enumerate(page, start):
+                for category, cell in zip(names, row):
+                    if not cell:
+                        continue
+                    # Rounded as the running totals round it.
+                    try:
+                        value = Money.parse(cell)
+                    except ValueError:
+                        value = None
+                    if value is None or not value.in_range():
+                        skipped[title] += 1
+                        continue
+                    yield {"month": title, "row": number,
+                           "category": category, "amount": str(value)}
+
+
+def write_csv(stream, rows):
+    """Returns:
+    (int): number of records written, after a header line."""
+    writer = csv.DictWriter(stream, FIELDS)
+    writer.writeheader()
+    count = 0
+    for count, record in enumerate(rows, 1):
+        writer.writerow(record)
+    return count
+
+
+def write_jsonl(stream, rows):
+    """Returns:
+    (int): number of records written, one JSON object per line."""
+    count = 0
+    for count, record in enumerate(rows, 1):
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+@contextlib.contextmanager
+def open_output(path, compress: bool):
+    """Opens the text stream records are written to.
+    Args:
+        path (str): File to write, or None or "-" for standard output.
+            A file is written beside it first and replaces it once the
+            export succeeds.
+        compress (bool): gzip what is written.
+    Yields:
+        (TextIOWrapper): UTF-8 text stream."""
+    to_file = path not in (None, "-")
+    if to_file:
+        temporary = f"{path}.{os.getpid()}.tmp"
+        raw = open(temporary, "wb")
+    else:
+        raw = sys.stdout.buffer
+    try:
+        binary = gzip.GzipFile(fileobj=raw, mode="wb") if compress else raw
+        text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        yield text
+        text.flush()
+        # Leave standard output open.
+        text.detach()
+        if compress:
+            binary.close()
+    except BaseException:
+        if to_file:
+            raw.close()
+            os.remove(temporary)
+        raise
+    if to_file:
+        raw.close()
+        os.replace(temporary, path)
+
+
+def main():
+    import run
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write, '-' for standard output")
+    parser.add_argument("--format", choices=sorted(WRITERS),
+                        help="default: from the file name, else csv")
+    parser.add_argument("--gzip", action="store_true",
+                        help="compress; implied by a .gz file name")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+    if args.page_size < 1:
+        parser.error("--page-size must be at least 1")
+    name = args.output[:-3] if args.output.endswith(".gz") else args.output
+    kind = args.format or ("jsonl" if name.endswith(".jsonl") else "csv")
+    compress = args.gzip or args.output.endswith(".gz")
+
+    skipped = Counter()
+    run.SHEET.start()
+    try:
+        rows = records(run.SHEET, list(run.MONTHS.values()), run.COLUMNS,
+                       skipped, args.page_size)
+        with open_output(args.output, compress) as stream:
+            count = WRITERS[kind](stream, rows)
+    finally:
+        run.SHEET.close()
+    print(f" ✅  {count} expenses exported.", file=sys.stderr)
+    for month, cells in skipped.items():
+        print(f" ⚠️  {month}: {cells} cell(s) were not amounts and were "
+              "left out.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""In-process stand-in for the Google Sheets API, for load testing.
+
+FakeSheets serves the storage interface described in storage.py from
+an in-memory LocalSpreadsheet. Every call counts as one API request:
+it is delayed by a simulated round trip, counted per method, and fails
+with a 429 APIError once the per-minute quota is used up, like Sheets.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from storage import LocalSpreadsheet
+
+MONTH_HEADER = [
+    ["Budget:", "", "", "", "Remaining:", ""],
+    ["Rent", "Groceries", "Vehicle", "Cafe/Restaurant", "Online Shopping",
+     "Other"],
+]
+OVERVIEW_HEADER = [
+    ["Month", "Rent", "Groceries", "Vehicle", "Cafe/Restaurant",
+     "Online Shopping", "Other"],
+]
+
+
+def quota_error(message="Quota exceeded for quota metric 'Read requests'"):
+    """Returns:
+    (APIError): the error gspread raises for an HTTP 429 response."""
+    import requests
+    from gspread.exceptions import APIError
+
+    response = requests.models.Response()
+    response.status_code = 429
+    response._content = json.dumps({"error": {
+        "code": 429, "message": message, "status": "RESOURCE_EXHAUSTED",
+    }}).encode()
+    return APIError(response)
+
+
+class FakeSheets:
+    """A fake Sheets server shared by any number of simulated users.
+    Args:
+        latency (float): Seconds added to every request.
+        jitter (float): Up to this many seconds added at random.
+        quota (int): Requests allowed per rolling minute, or None.
+        error_rate (float): Share of requests failing with a 429 anyway.
+        seed (int): Seed for jitter and injected errors."""
+
+    def __init__(self, latency=0.0, jitter=0.0, quota=None, error_rate=0.0,
+                 seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota = quota
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.backend = LocalSpreadsheet(":memory:")
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def seed_months(self, months):
+        """Creates empty month worksheets and the Overview worksheet.
+        Args:
+            months (iterable): Names of the month worksheets.
+        Returns: None."""
+        for month in months:
+            self.backend._store(month, MONTH_HEADER)
+        self.backend._store("Overview", OVERVIEW_HEADER)
+
+    def request(self, method: str, func, *args, **kwargs):
+        """Runs func as one API request named method.
+        Returns:
+            the result of func."""
+        with self._lock:
+            self.calls[method] += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            over_quota = (
+                self.quota is not None and len(self._recent) >= self.quota)
+            if over_quota or self._random.random() < self.error_rate:
+                self.errors += 1
+                raise quota_error()
+            self._recent.append(now)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        return func(*args, **kwargs)
+
+    def snapshot(self):
+        """Returns:
+        (Counter): request counts by method so far."""
+        with self._lock:
+            return Counter(self.calls)
+
+
+class FakeSpreadsheet:
+    """The spreadsheet as seen through FakeSheets."""
+
+    def __init__(self, server):
+        self.server = server
+        self.id = "fake-tag-track"
+        self.title = "Tag-Track"
+
+    def worksheet(self, title: str):
+        return self.server.request("worksheet", self._open, title)
+
+    def _open(self, title: str):
+        if title not in self.server.backend.titles():
+            from gspread.exceptions import WorksheetNotFound
+
+            raise WorksheetNotFound(title)
+        return FakeWorksheet(self, title)
+
+    def values_batch_get(self, ranges: list, params=None):
+        return self.server.request(
+            "values_batch_get", self.server.backend.values_batch_get, ranges)
+
+    def values_batch_update(self, body=None, params=None):
+        return self.server.request(
+            "values_batch_update",
+            self.server.backend.values_batch_update, body)
+
+    def values_append(self, range, params=None, body=None):
+        return self.server.request(
+            "values_append", self.server.backend.values_append, range,
+            params, body)
+
+
+class FakeWorksheet:
+    """A worksheet whose every method is one request to FakeSheets."""
+
+    def __init__(self, spreadsheet, title: str):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._local = spreadsheet.server.backend.worksheet(title)
+
+    def _request(self, method: str, *args, **kwargs):
+        func = getattr(self._local, method)
+        return self.spreadsheet.server.request(method, func, *args, **kwargs)
+
+    def acell(self, label: str):
+        return self._request("acell", label)
+
+    def col_values(self, col: int):
+        return self._request("col_values", col)
+
+    def row_values(self, row: int):
+        return self._request("row_values", row)
+
+    def get_all_values(self):
+        return self._request("get_all_values")
+
+    def update_acell(self, label: str, value):
+        return self._request("update_acell", label, value)
+
+    def update(self, range_name: str, values=None, **kwargs):
+        return self._request("update", range_name, values, **kwargs)
+
+    def append_row(self, values: list, value_input_option="RAW"):
+        return self._request("append_row", values, value_input_option)
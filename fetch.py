@@ -0,0 +1,116 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+import ledger
+from month_lock import month_lock
+import snapshot
+from storage import refresh_local
+
+# Reads that do not depend on each other run here, side by side.
+# Bounded, and shared by every session of a server.
+FETCH_WORKERS = 8
+POOL = ThreadPoolExecutor(FETCH_WORKERS, "sheets-fetch")
+# Months read ahead while the user is still confirming their choice.
+# Separate from POOL, as fetch_month() itself waits on POOL.
+PREFETCH = ThreadPoolExecutor(FETCH_WORKERS, "sheets-prefetch")
+
+# The Overview's heading and month rows, read along with a month so a
+# session can put back the row it changes there.
+OVERVIEW_ROWS = "A1:G13"
+
+# Seconds after which a month is read in full again, in the same request
+# as its header rows, as only the last row its running totals cover is
+# checked otherwise: rows edited above it, e.g. by hand in Google Sheets,
+# are counted from then on. Needs snapshots; TAG_TRACK_VERIFY_LEDGER
+# checks every time.
+RESCAN_AFTER = 24 * 60 * 60
+
+# Everything the budget and summary screens read from a month, and the
+# version of the month it was read at (see month_lock).
+MonthState = namedtuple(
+    "MonthState",
+    ["worksheet", "budget", "remainder", "totals", "row_count", "overview",
+     "version"])
+
+
+def fetch_month(cache, spreadsheet, title: str):
+    """Reads a month's budget, remainder and running totals while the
+    Overview worksheet is opened and read in the pool. Everything read
+    is kept in the cache, so later reads of it cost no requests.
+    Nothing is written to the sheet; the month's snapshot is updated.
+    Args:
+        cache (SheetCache): Cache of the session.
+        spreadsheet (Spreadsheet): Spreadsheet holding the worksheets.
+        title (str): Name of the month worksheet.
+    Returns:
+        (MonthState): the month's state; overview is None if the
+        Overview worksheet could not be opened."""
+    # Taken before reading, so it is never newer than what was read.
+    version = month_lock(spreadsheet.id, title).version
+    # A local copy picks up what others wrote since, in the background.
+    refresh_local(spreadsheet, title)
+    # The pool thread runs in this context, e.g. the traced stage.
+    overview = POOL.submit(
+        copy_context().run, cache.worksheet, spreadsheet, "Overview")
+    overview_rows = POOL.submit(
+        copy_context().run, cache.prime, spreadsheet, "Overview",
+        OVERVIEW_ROWS)
+    known = snapshot.load(spreadsheet.id, title)
+    # The header rows, with the category names, are read while the
+    # worksheet opens. If an earlier run says where the tail starts,
+    # the tail comes in the same request.
+    # Every row, once the totals have gone unchecked for long enough.
+    if known is None:
+        tail = (None, None)
+    elif time.time() - known.verified >= RESCAN_AFTER:
+        tail = (ledger.HEADER_ROWS + 1, ledger.LAST_COLUMN)
+    else:
+        tail = (ledger.tail_start(known.row_count), ledger.LAST_COLUMN)
+    primed = POOL.submit(
+        copy_context().run, cache.prime, spreadsheet, title,
+        ledger.HEADER_RANGE, *tail)
+    worksheet = cache.worksheet(spreadsheet, title)
+    # Should it fail, the reads below are made one by one instead.
+    primed.exception()
+    # Each of these needs the one before, so they stay in this thread.
+    budget = cache.cell(worksheet, "B1")
+    remainder = cache.cell(worksheet, "F1")
+    # Only reads: the month may be prefetched and then not chosen.
+    totals, row_count = ledger.load_totals(cache, worksheet, store=False)
+    current = snapshot.from_header(
+        cache.header(worksheet), verified_at(cache, worksheet, known))
+    if current != known:
+        snapshot.save(spreadsheet.id, title, current)
+    # Should it fail, the row is read on its own when needed.
+    overview_rows.exception()
+    # A missing Overview only matters on upload, which reports it then.
+    if overview.exception() is not None:
+        overview = None
+    else:
+        overview = overview.result()
+    return MonthState(worksheet, budget, remainder, totals, row_count,
+                      overview, version)
+
+
+def verified_at(cache, worksheet, known):
+    """Args:
+        cache (SheetCache): Cache of the session.
+        worksheet (Worksheet): Month worksheet.
+        known (Snapshot): The month's snapshot, or None.
+    Returns:
+        (int): Unix time the stored running totals last matched every
+        row: now if the cache holds every row and they match them."""
+    if cache.covers(worksheet.title, ledger.HEADER_ROWS + 1):
+        stored = ledger.read_ledger(cache.header(worksheet))
+        if stored == ledger.load_totals(cache, worksheet, store=False):
+            return int(time.time())
+    return known.verified if known is not None else 0
+
+
+def prefetch_month(cache, spreadsheet, title: str):
+    """Starts fetch_month() in the background.
+    Returns:
+        (Future): resolves to the MonthState, or raises its error."""
+    return PREFETCH.submit(
+        copy_context().run, fetch_month, cache, spreadsheet, title)
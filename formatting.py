@@ -0,0 +1,83 @@
+from functools import lru_cache
+from currencies import Currency
+
+
+@lru_cache(maxsize=None)
+def get_currency_format(code="EUR"):
+    """Builds the currency formatter once per currency code.
+    Args:
+        code (str): ISO currency code, e.g. "EUR".
+    Returns:
+        (tuple): format function, symbol prefix and symbol suffix."""
+    # Code taken from Currency example on pypi.org
+    currency = Currency(code)
+    template = currency.money_formats[code]["money_format"]
+    prefix, suffix = template.split("{amount}")
+    return template.format, prefix, suffix
+
+
+def format_expenses(expense: float, code="EUR"):
+    """Formats the user's expenses with the chosen currency symbol.
+    Args:
+        expense (num): Value of expense.
+        code (str): Has a default value of "EUR".
+    Returns:
+        formatted_expense (str): Formatted Expense."""
+    format_amount, _, _ = get_currency_format(code)
+    return format_amount(amount=expense)
+
+
+def parse_expense(exp_value: str, code="EUR"):
+    """Removes currency symbol and thousands separators.
+    Args:
+        exp_value (str): Formatted value, e.g. "€1,234.5" or "-€3".
+        code (str): Has a default value of "EUR".
+    Returns:
+        (float): None for an empty value, or the number."""
+    if not exp_value:
+        return None
+    _, prefix, suffix = get_currency_format(code)
+    return _parse(exp_value, prefix, suffix)
+
+
+def _parse(exp_value: str, prefix: str, suffix: str):
+    """Parses one non-empty value once the symbol is known."""
+    sign = ""
+    if exp_value[0] == "-":
+        sign, exp_value = "-", exp_value[1:]
+    if prefix and exp_value.startswith(prefix):
+        exp_value = exp_value[len(prefix):]
+    if suffix and exp_value.endswith(suffix):
+        exp_value = exp_value[:-len(suffix)]
+    return float(sign + exp_value.replace(",", ""))
+
+
+def format_many(expenses, code="EUR"):
+    """Formats a whole column of values at once.
+    Args:
+        expenses (iterable): Numbers to be formatted.
+        code (str): Has a default value of "EUR".
+    Returns:
+        (list): Formatted values."""
+    _, prefix, suffix = get_currency_format(code)
+    return [f"{prefix}{expense}{suffix}" for expense in expenses]
+
+
+def parse_many(exp_values, code="EUR"):
+    """Parses a whole column of formatted values at once.
+    Empty cells are skipped, so the result can be summed directly.
+    Args:
+        exp_values (iterable): Formatted values from a worksheet.
+        code (str): Has a default value of "EUR".
+    Returns:
+        (list): floats, as parse_expense() would return them."""
+    _, prefix, suffix = get_currency_format(code)
+    values = [value for value in exp_values if value]
+    if not values:
+        return []
+    # One pass over the joined column instead of one parse per cell.
+    text = "\n".join(values).replace(",", "")
+    for symbol in (prefix, suffix):
+        if symbol:
+            text = text.replace(symbol, "")
+    return list(map(float, text.split("\n")))
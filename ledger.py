@@ -0,0 +1,227 @@
+import zlib
+from functools import lru_cache
+from aggregate import category_totals, expense_matrix
+
+# Running totals kept in each month sheet, next to the budget cells:
+# H1:M1 hold the total cents of each category, N1 the number of rows
+# below the two header rows that those totals cover, and O1 a checksum
+# of the last of those rows.
+LEDGER_RANGE = "H1:O1"
+LEDGER_START = 7
+CATEGORIES = 6
+HEADER_ROWS = 2
+# The header rows: budget cells and running totals in the first, the
+# names of the categories from A in the second.
+HEADER_RANGE = "A1:" + LEDGER_RANGE.split(":")[1][:-1] + str(HEADER_ROWS)
+# Expense rows span columns A to F, one per category.
+LAST_COLUMN = chr(ord("A") + CATEGORIES - 1)
+
+
+def read_ledger(header: list):
+    """Reads the running totals from a month sheet's first row.
+    Args:
+        header (list): Values of the first row.
+    Returns:
+        (tuple): category totals in cents and row count, or None."""
+    cells = header[LEDGER_START:LEDGER_START + CATEGORIES + 1]
+    try:
+        numbers = [int(cell) for cell in cells]
+    except ValueError:
+        return None
+    if len(numbers) != CATEGORIES + 1:
+        return None
+    return numbers[:CATEGORIES], numbers[CATEGORIES]
+
+
+@lru_cache(maxsize=None)
+def column_index(names: tuple):
+    """Maps the categories of a month sheet to their columns.
+    Args:
+        names (tuple): Values of the sheet's second header row.
+    Returns:
+        (dict): column of each category name, from 0, in column order,
+        or None unless the row names one to CATEGORIES categories, each
+        once and with no gaps. Shared, so not to be changed."""
+    names = [str(name).strip() for name in names[:CATEGORIES]]
+    while names and not names[-1]:
+        names.pop()
+    if not names or not all(names) or len(set(names)) != len(names):
+        return None
+    return {name: column for column, name in enumerate(names)}
+
+
+def read_checksum(header: list):
+    """Returns:
+    (str): checksum of the last row the running totals cover, or None
+    for totals stored before there was one."""
+    index = LEDGER_START + CATEGORIES + 1
+    if len(header) > index and header[index]:
+        return header[index]
+    return None
+
+
+def row_checksum(cents: list):
+    """Args:
+        cents (list): Cents of one row, one per category.
+    Returns:
+        (str): CRC-32 of the row, as 8 hex digits."""
+    return format(zlib.crc32(",".join(map(str, cents)).encode()), "08x")
+
+
+def ledger_values(totals: list, row_count: int, checksum):
+    """Returns:
+    (list): the cells of LEDGER_RANGE."""
+    values = [str(total) for total in totals]
+    return values + [str(row_count), checksum or ""]
+
+
+def write_ledger(cache, worksheet, totals: list, row_count: int, checksum):
+    """Stores the running totals through the cache.
+    Returns: None."""
+    values = ledger_values(totals, row_count, checksum)
+    cache.update(worksheet, LEDGER_RANGE, [values])
+
+
+def tail_start(row_count: int):
+    """Returns:
+    (int): first row to read to bring totals covering row_count rows
+    up to date: the last row they cover, or the first expense row."""
+    return HEADER_ROWS + max(row_count, 1)
+
+
+def follow_tail(totals: list, row_count: int, checksum, rows: list):
+    """Adds the rows appended since the totals were stored, e.g. by
+    hand in Google Sheets.
+    Args:
+        totals (list): Stored category totals in cents.
+        row_count (int): Rows the totals cover.
+        checksum (str): Checksum of the last of them, or None.
+        rows (list): Rows from tail_start(row_count) to the end.
+    Returns:
+        (tuple): totals, row count and checksum of the last row, or
+        None if the rows the totals cover were edited or removed."""
+    if row_count:
+        if not rows:
+            return None
+        last, *rows = rows
+        if checksum is not None and checksum != row_checksum(
+                category_totals(expense_matrix([last], CATEGORIES))):
+            return None
+    if not rows:
+        return totals, row_count, checksum
+    added = category_totals(expense_matrix(rows, CATEGORIES))
+    last = category_totals(expense_matrix(rows[-1:], CATEGORIES))
+    return ([total + value for total, value in zip(totals, added)],
+            row_count + len(rows), row_checksum(last))
+
+
+def scan_totals(cache, worksheet):
+    """Recomputes the totals from every row of the month sheet.
+    Returns:
+        (tuple): category totals in cents, row count and checksum."""
+    rows = cache.tail(worksheet, HEADER_ROWS + 1, LAST_COLUMN)
+    return follow_tail([0] * CATEGORIES, 0, None, rows)
+
+
+def load_totals(cache, worksheet, store=True):
+    """Reads the running totals and only the rows from the last one
+    they cover on. The whole sheet is read instead if that row has
+    changed, or once for older sheets. If every row is cached already,
+    e.g. on a month's periodic full read (see fetch.RESCAN_AFTER), the
+    totals are worked out from all of them, so rows edited above the
+    last one count too.
+    Args:
+        cache (SheetCache): Cache used for reads and writes.
+        worksheet (Worksheet): Month worksheet.
+        store (bool): Store totals that had to be updated in the sheet.
+    Returns:
+        (tuple): category totals in cents and row count."""
+    header = cache.header(worksheet)
+    ledger = read_ledger(header)
+    stored = current = None
+    if ledger is not None:
+        stored = (*ledger, read_checksum(header))
+        rows = cache.tail(worksheet, tail_start(ledger[1]), LAST_COLUMN)
+        current = follow_tail(*stored, rows)
+    if current is None or cache.covers(worksheet.title, HEADER_ROWS + 1):
+        current = scan_totals(cache, worksheet)
+    if store and current != stored:
+        write_ledger(cache, worksheet, *current)
+    return current[:2]
+
+
+def record_row(cache, worksheet, cents: list, row=None):
+    """Adds one appended row to the running totals, or one written to a
+    covered row that remove_row() left blank.
+    Args:
+        cache (SheetCache): Cache used for reads and writes.
+        worksheet (Worksheet): Month worksheet.
+        cents (list): Cents of the new row, one per category.
+        row (int): Number of such a blank row, or None to append.
+    Returns:
+        (int): Row number the new row should be written to."""
+    totals, row_count = load_totals(cache, worksheet)
+    totals = [total + value for total, value in zip(totals, cents)]
+    last = HEADER_ROWS + row_count
+    if row is None or row > last:
+        write_ledger(cache, worksheet, totals, row_count + 1,
+                     row_checksum(cents))
+        return last + 1
+    checksum = (row_checksum(cents) if row == last
+                else read_checksum(cache.header(worksheet)))
+    write_ledger(cache, worksheet, totals, row_count, checksum)
+    return row
+
+
+def remove_row(cache, worksheet, row: int, width: int):
+    """Takes one covered row back out of the running totals and blanks
+    it, e.g. a row written ahead of the upload that writes it again.
+    Args:
+        cache (SheetCache): Cache used for reads and writes.
+        worksheet (Worksheet): Month worksheet.
+        row (int): Number of the row, from 1.
+        width (int): Cells of the row to blank, from column A.
+    Returns:
+        (bool): False if the totals do not cover the row."""
+    totals, row_count = load_totals(cache, worksheet)
+    last = HEADER_ROWS + row_count
+    if not HEADER_ROWS < row <= last:
+        return False
+    # The row before it too, in case it becomes the last one covered.
+    first = max(row - 1, HEADER_ROWS + 1)
+    rows = cache.tail(worksheet, first, LAST_COLUMN)[:row - first + 1]
+    rows += [[] for _ in range(row - first + 1 - len(rows))]
+    cents = category_totals(expense_matrix(rows[-1:], CATEGORIES))
+    totals = [total - value for total, value in zip(totals, cents)]
+    checksum = read_checksum(cache.header(worksheet))
+    if row == last:
+        row_count -= 1
+        checksum = row_checksum(category_totals(
+            expense_matrix(rows[:1], CATEGORIES))) if row_count else None
+    write_ledger(cache, worksheet, totals, row_count, checksum)
+    end = chr(ord("A") + width - 1)
+    cache.update(worksheet, f"A{row}:{end}{row}", [[""] * width])
+    return True
+
+
+def verify(cache, worksheet):
+    """Compares the running totals with a full re-read of the sheet.
+    The stored totals are replaced if they drifted.
+    Args:
+        cache (SheetCache): Cache used for reads and writes.
+        worksheet (Worksheet): Month worksheet.
+    Returns:
+        (dict): stored and actual values that differ, keyed by
+        "rows" or by category number (1-6)."""
+    stored_totals, stored_count = load_totals(cache, worksheet)
+    cache.invalidate(worksheet.title)
+    totals, row_count, checksum = scan_totals(cache, worksheet)
+    drift = {}
+    if row_count != stored_count:
+        drift["rows"] = (stored_count, row_count)
+    for index, (stored, actual) in enumerate(zip(stored_totals, totals)):
+        if stored != actual:
+            drift[index + 1] = (stored, actual)
+    if drift:
+        write_ledger(cache, worksheet, totals, row_count, checksum)
+    return drift
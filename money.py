@@ -0,0 +1,134 @@
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+from formatting import get_currency_format
+
+# Largest amount taken as an expense or budget, either way, in cents:
+# €10,000,000,000. Totals of millions of them still fit the int64
+# arrays of aggregate and the snapshots.
+MAX_CENTS = 10 ** 12
+# Anything in a column of plain numbers that a float may round
+# differently from Money.parse(): a third decimal, an exponent, a word
+# such as "nan", or any other character.
+NOT_PLAIN = re.compile(r"\.\d{3}|[^\d.\n-]")
+
+
+@total_ordering
+class Money:
+    """An amount of money stored as a whole number of cents.
+    str() gives the plain amount, e.g. "12.50", so format_expenses()
+    adds the currency symbol as it does for any number."""
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        self.cents = int(cents)
+
+    @classmethod
+    def parse(cls, value: str, code="EUR"):
+        """Parses user input or a formatted worksheet value.
+        Args:
+            value (str): e.g. "12.5", "€1,234.50" or "-€3".
+            code (str): Has a default value of "EUR".
+        Returns:
+            (Money): the amount, rounded half up to whole cents.
+        Raises:
+            ValueError: value is not one finite number, e.g. "nan",
+            "inf" or "1 2"."""
+        _, prefix, suffix = get_currency_format(code)
+        text, value = value, value.strip().replace(",", "")
+        sign = ""
+        if value.startswith("-"):
+            sign, value = "-", value[1:]
+        if prefix and value.startswith(prefix):
+            value = value[len(prefix):]
+        if suffix and value.endswith(suffix):
+            value = value[:-len(suffix)]
+        try:
+            amount = Decimal(sign + value.strip()) * 100
+        except InvalidOperation:
+            raise ValueError(f"not an amount: {text!r}") from None
+        if not amount.is_finite():
+            raise ValueError(f"not a finite amount: {text!r}")
+        return cls(amount.to_integral_value(rounding=ROUND_HALF_UP))
+
+    def in_range(self):
+        """Returns:
+        (bool): whether the amount is within MAX_CENTS either way."""
+        return -MAX_CENTS <= self.cents <= MAX_CENTS
+
+    def __add__(self, other):
+        return Money(self.cents + other.cents)
+
+    def __sub__(self, other):
+        return Money(self.cents - other.cents)
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents == other.cents
+
+    def __lt__(self, other):
+        return self.cents < other.cents
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __str__(self):
+        sign = "-" if self.cents < 0 else ""
+        units, cents = divmod(abs(self.cents), 100)
+        return f"{sign}{units}.{cents:02d}"
+
+    def __format__(self, spec: str):
+        return format(str(self), spec)
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+
+def parse_cents(values, code="EUR"):
+    """Parses a whole column of worksheet cells into cents, rounding
+    half up like Money.parse(), e.g. "€0.125" is 13 cents.
+    Args:
+        values (iterable): Formatted values from a worksheet.
+        code (str): Has a default value of "EUR".
+    Returns:
+        (list): cents of each cell holding an amount within MAX_CENTS;
+        empty cells and any others are skipped."""
+    _, prefix, suffix = get_currency_format(code)
+    values = [value for value in values if value]
+    if not values:
+        return []
+    # One pass over the joined column instead of one parse per cell.
+    text = "\n".join(values).replace(",", "")
+    for symbol in (prefix, suffix):
+        if symbol:
+            text = text.replace(symbol, "")
+    # With at most two decimals a float holds the cents exactly.
+    if not NOT_PLAIN.search(text):
+        try:
+            cents = [round(float(number) * 100)
+                     for number in text.split("\n")]
+        except ValueError:
+            pass
+        else:
+            return [value for value in cents
+                    if -MAX_CENTS <= value <= MAX_CENTS]
+    cents = []
+    for value in values:
+        try:
+            amount = Money.parse(value, code)
+        except ValueError:
+            continue
+        if amount.in_range():
+            cents.append(amount.cents)
+    return cents
@@ -0,0 +1,53 @@
+"""Serialises the writes to each month worksheet within one process.
+
+The sessions of server.py share one process. An upload reads its month
+again right before writing it, but two uploads at once would both read
+the sheet before either of them writes. Uploads, autosaves and taking
+autosaved expenses back out hold the month's MonthLock from their read
+to their write.
+
+Each write made under the lock counts up the month's version. Autosave
+writes running totals worked out from what its session read, so it only
+writes while the version is the one its session last saw; otherwise
+another session has written the month since, and the upload works the
+totals out from the sheet instead.
+
+Writers in other processes, e.g. a second server or the cli commands,
+are not covered: their writes can still land between a read and a
+write here.
+"""
+import threading
+
+# Lock of each (spreadsheet id, worksheet title), made on first use.
+LOCKS = {}
+LOCKS_GUARD = threading.Lock()
+
+
+class MonthLock:
+    """Lock and version of one month worksheet. Use it as a context
+    manager to hold the lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def written(self):
+        """Counts a write made while holding the lock.
+        Returns:
+            (int): the new version."""
+        self.version += 1
+        return self.version
+
+
+def month_lock(spreadsheet_id: str, title: str):
+    """Returns:
+    (MonthLock): the worksheet's lock, the same for every session."""
+    with LOCKS_GUARD:
+        return LOCKS.setdefault((spreadsheet_id, title), MonthLock())
@@ -0,0 +1,167 @@
+"""Keeps every session of a process within the Sheets API quota.
+
+One RateLimiter is shared by all calls to Google Sheets (see
+open_storage()). It hands out tokens from a bucket refilled at a steady
+rate, serving calls a user waits on, such as reads and the upload,
+before background ones, such as autosave and SyncWorker writes, which
+can be sent a moment later. Callers mark theirs with background().
+Calls refused with a
+429, or failing with a 5xx, are retried after a jittered exponential
+backoff, and a 429 empties the bucket so every session slows down.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Google's default quota is 60 requests a minute per user, and the app
+# uses one service account: so about one request a second.
+RATE = 1.0
+BURST = 60
+
+INTERACTIVE = 0
+BACKGROUND = 1
+# Priority of the calls of the running thread or task: a user waits on
+# them unless its caller says otherwise.
+PRIORITY = ContextVar("priority", default=INTERACTIVE)
+# Calls that may already have been applied when a 5xx comes back.
+NOT_IDEMPOTENT = {"append_row", "values_append"}
+
+
+@contextmanager
+def background():
+    """Makes the calls of the block BACKGROUND, served after every
+    call a user is waiting on.
+    Returns: a context manager."""
+    token = PRIORITY.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+
+def status_code(error):
+    """Returns:
+    (int): HTTP status of a gspread APIError, or None."""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+class RateLimiter:
+    """Token bucket with prioritised waiting and retries.
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Tokens the bucket holds at most.
+        retries (int): Retries of a throttled or failed call.
+        backoff (float): Seconds before the first retry.
+        max_backoff (float): Longest wait between retries.
+        seed (int): Seed for the jitter."""
+
+    def __init__(self, rate=RATE, burst=BURST, retries=5, backoff=1.0,
+                 max_backoff=32.0, seed=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.tokens = float(burst)
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.last_error = None
+        self._updated = time.monotonic()
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+        self._random = random.Random(seed)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE):
+        """Waits for a token; lower priorities go first, then by arrival.
+        Returns: None."""
+        with self._condition:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                self._refill()
+                if self._waiting[0] == ticket and self.tokens >= 1:
+                    heapq.heappop(self._waiting)
+                    self.tokens -= 1
+                    self.calls += 1
+                    # The next in line may be able to go too.
+                    self._condition.notify_all()
+                    return
+                timeout = None
+                if self.tokens < 1:
+                    timeout = (1 - self.tokens) / self.rate
+                self._condition.wait(timeout)
+
+    def delay(self, attempt: int):
+        """Returns:
+        (float): seconds before retry number attempt (from 0), half
+        fixed and half random."""
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return ceiling / 2 + self._random.uniform(0, ceiling / 2)
+
+    def retryable(self, name: str, error):
+        """Returns:
+        (bool): whether the failed call name may be sent again."""
+        status = status_code(error)
+        if status == 429:
+            return True
+        return (status is not None and 500 <= status < 600
+                and name not in NOT_IDEMPOTENT)
+
+    def call(self, name: str, func, *args, **kwargs):
+        """Runs func as the Sheets call name within the quota, at the
+        priority its caller set (see background()).
+        Returns:
+            the result of func, once it succeeds."""
+        priority = PRIORITY.get()
+        attempt = 0
+        while True:
+            self.acquire(priority)
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                if attempt >= self.max_retries or not self.retryable(
+                        name, error):
+                    raise
+                with self._condition:
+                    self.retries += 1
+                    self.last_error = error
+                    if status_code(error) == 429:
+                        self.throttled += 1
+                        self.tokens = 0.0
+            time.sleep(self.delay(attempt))
+            attempt += 1
+
+    def state(self):
+        """Returns:
+        (dict): tokens, waiting calls by priority and retry counts."""
+        with self._condition:
+            self._refill()
+            waiting = [priority for priority, _ in self._waiting]
+            return {
+                "tokens": round(self.tokens, 2),
+                "waiting": len(waiting),
+                "waiting_interactive": waiting.count(INTERACTIVE),
+                "waiting_background": waiting.count(BACKGROUND),
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "last_error": None if self.last_error is None
+                else repr(self.last_error),
+            }
+
+
+# Shared by every spreadsheet opened with open_storage().
+LIMITER = RateLimiter()
@@ -0,0 +1,81 @@
+"""Draws the parts of the screen that stay the same or are repeated.
+
+The screen is cleared with ANSI escapes instead of running `clear`, and
+the banner and the MONTHS/EXPENSES menus are built once per process.
+table() lays out a table the way PrettyTable does, left-aligned unless
+told otherwise, in a single pass over cells that are already plain text
+and a colour.
+"""
+import os
+from functools import lru_cache
+from termcolor import colored
+
+# Erases the screen and moves the cursor to the top left.
+CLEAR = "\033[2J\033[H"
+
+
+def clear():
+    """Clears the terminal screen. Returns: None."""
+    # For windows os, whose older consoles ignore ANSI escapes.
+    if os.name == "nt":
+        os.system("cls")
+    else:
+        print(CLEAR, end="", flush=True)
+
+
+@lru_cache(maxsize=None)
+def banner():
+    """Returns:
+    (str): the "$ Tag - Track" heading, in light green."""
+    from art import text2art
+    from colorama import Fore
+
+    return Fore.LIGHTGREEN_EX + text2art("$ Tag - Track") + Fore.RESET
+
+
+def paint(text: str, colour):
+    """Returns:
+    (str): text in colour, or as it is for no colour."""
+    return text if colour is None else colored(text, colour)
+
+
+def table(fields: list, rows: list, align=""):
+    """Lays out a table with a frame and a header rule.
+    Args:
+        fields (list): (text, colour) of each column heading.
+        rows (list): Rows of (text, colour) cells, colour None for none.
+        align (str): "l" or "r" for each column; columns past its end
+            are left-aligned.
+    Returns:
+        (str): the table."""
+    widths = [max(len(text) for text, _ in column)
+              for column in zip(fields, *rows)]
+    rule = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    right = [index < len(align) and align[index] == "r"
+             for index in range(len(widths))]
+
+    def cell(text, colour, width, to_right):
+        padding = " " * (width - len(text))
+        painted = paint(text, colour)
+        return padding + painted if to_right else painted + padding
+
+    def line(cells):
+        return "| " + " | ".join(
+            cell(text, colour, width, to_right)
+            for (text, colour), width, to_right
+            in zip(cells, widths, right)) + " |"
+
+    return "\n".join([rule, line(fields), rule, *map(line, rows), rule])
+
+
+@lru_cache(maxsize=None)
+def menu(items: tuple, heading: str, colour: str):
+    """Args:
+        items (tuple): (number, name) of each choice.
+        heading (str): Heading of the names column.
+        colour (str): Colour of the headings.
+    Returns:
+        (str): the numbered menu table."""
+    return table(
+        [("No.", colour), (heading, colour)],
+        [[(str(num), "white"), (str(name), "white")] for num, name in items])
@@ -0,0 +1,200 @@
+"""Year report across every month worksheet.
+
+Reads the header rows of all twelve month sheets and the Overview rows
+in one values batch_get, then the rows appended after each month's running
+totals (see ledger) in another; older months are read in full in it.
+
+    python3 report.py                     prints the report
+    python3 report.py --rebuild-overview  also rewrites Overview B2:G13
+"""
+import argparse
+from array import array
+from collections import namedtuple
+from formatting import format_expenses, format_many
+import ledger
+from money import Money
+from render import table
+from write_buffer import quoted, raw_values
+
+OVERVIEW_RANGE = "B2:G13"
+
+# totals: one row of category cents per month. by_category: one
+# array('q') per category, across months. overview: Overview B2:G13.
+# columns: each month's ledger.column_index(), None if it names none.
+# checksums: ledger.row_checksum() of each month's last row, or None.
+YearReport = namedtuple(
+    "YearReport",
+    ["months", "budgets", "row_counts", "totals", "by_category",
+     "overview", "columns", "checksums"])
+
+
+def batch_get(spreadsheet, ranges: list):
+    """Returns:
+    (list): rows of values of each range, in order."""
+    response = spreadsheet.values_batch_get(ranges)
+    return [value_range.get("values", [])
+            for value_range in response["valueRanges"]]
+
+
+def fetch_year(spreadsheet, months: list):
+    """Reads budgets and category totals of every month.
+    Args:
+        spreadsheet (Spreadsheet): The Tag-Track spreadsheet.
+        months (list): Names of the month worksheets, in order.
+    Returns:
+        (YearReport): the year's figures."""
+    *headers, overview = batch_get(
+        spreadsheet,
+        [quoted(month, ledger.HEADER_RANGE) for month in months]
+        + [quoted("Overview", OVERVIEW_RANGE)])
+    columns = [ledger.column_index(tuple(rows[1] if len(rows) > 1 else []))
+               for rows in headers]
+    headers = [rows[0] if rows else [] for rows in headers]
+    stored = []
+    for header in headers:
+        found = ledger.read_ledger(header)
+        stored.append((*found, ledger.read_checksum(header)) if found
+                      else ([0] * ledger.CATEGORIES, 0, None))
+    # Only the rows from the last one each month's totals cover, and
+    # every row of months without running totals.
+    tails = batch_get(spreadsheet, [
+        quoted(month, f"A{ledger.tail_start(row_count)}:{ledger.LAST_COLUMN}")
+        for month, (_, row_count, _) in zip(months, stored)])
+    ledgers = [ledger.follow_tail(*month, rows)
+               for month, rows in zip(stored, tails)]
+    # Months whose covered rows were edited are read again in full.
+    edited = [index for index, found in enumerate(ledgers) if not found]
+    if edited:
+        rows_range = f"A{ledger.HEADER_ROWS + 1}:{ledger.LAST_COLUMN}"
+        scanned = batch_get(
+            spreadsheet, [quoted(months[index], rows_range)
+                          for index in edited])
+        for index, rows in zip(edited, scanned):
+            ledgers[index] = ledger.follow_tail(
+                [0] * ledger.CATEGORIES, 0, None, rows)
+    budgets = [
+        Money.parse(header[1]) if len(header) > 1 and header[1] else None
+        for header in headers
+    ]
+    totals = [totals for totals, _, _ in ledgers]
+    return YearReport(
+        months=months,
+        budgets=budgets,
+        row_counts=[row_count for _, row_count, _ in ledgers],
+        totals=totals,
+        by_category=[array("q", column) for column in zip(*totals)],
+        overview=overview,
+        columns=columns,
+        checksums=[checksum for _, _, checksum in ledgers],
+    )
+
+
+def headings(report, default: dict):
+    """Names the category columns of the year table.
+    Args:
+        report (YearReport): Figures from fetch_year().
+        default (dict): Columns of months that do not name theirs, as
+            ledger.column_index() maps them.
+    Returns:
+        (list): one heading per ledger column, the names the months
+        give it joined with "/" where they differ."""
+    layouts = [list(columns or default) for columns in report.columns]
+    names = []
+    for column in range(ledger.CATEGORIES):
+        found = []
+        for layout in layouts:
+            if column < len(layout) and layout[column] not in found:
+                found.append(layout[column])
+        names.append("/".join(found))
+    return names
+
+
+def render(report, default: dict, colour="light_green"):
+    """Builds the year table: categories, spending and budget use.
+    Args:
+        report (YearReport): Figures from fetch_year().
+        default (dict): Columns of months that do not name theirs.
+        colour (str): Has a default value of "light_green".
+    Returns:
+        (str): the table."""
+    names = headings(report, default)
+    fields = ["Month"] + names + ["Spent", "Budget", "Remaining", "Used"]
+    rows = []
+    for month, budget, totals in zip(
+            report.months, report.budgets, report.totals):
+        spent = Money(sum(totals))
+        row = [month[:3]] + format_many(Money(cents) for cents in totals)
+        row.append(format_expenses(spent))
+        styles = ["white"] * len(row)
+        if budget is None:
+            row += ["-", "-", "-"]
+            styles += ["white"] * 3
+        else:
+            remaining = budget - spent
+            used = f"{spent.cents / budget.cents:.0%}" if budget else "-"
+            row += [format_expenses(budget), format_expenses(remaining),
+                    used]
+            styles += ["white",
+                       "red" if remaining < Money(0) else "white", "white"]
+        rows.append(list(zip(row, styles)))
+    year = [sum(column) for column in report.by_category]
+    footer = (format_many(Money(cents) for cents in year)
+              + [format_expenses(Money(sum(year))), "", "", ""])
+    rows.append([("Year", colour)] + [(text, "white") for text in footer])
+    return table([(name, colour) for name in fields], rows,
+                 "l" + "r" * (len(fields) - 1))
+
+
+def overview_values(report):
+    """Returns:
+    (list): Overview rows B2:G13, empty for months with no expenses."""
+    return [
+        format_many(Money(cents) for cents in totals) if row_count else
+        [""] * ledger.CATEGORIES
+        for totals, row_count in zip(report.totals, report.row_counts)
+    ]
+
+
+def rebuild_overview(spreadsheet, report):
+    """Rewrites Overview B2:G13 from the month totals in one write.
+    Args:
+        spreadsheet (Spreadsheet): The Tag-Track spreadsheet.
+        report (YearReport): Figures from fetch_year().
+    Returns:
+        (bool): False if the Overview was already up to date."""
+    values = overview_values(report)
+    current = [row + [""] * (ledger.CATEGORIES - len(row))
+               for row in report.overview]
+    current += [[""] * ledger.CATEGORIES] * (len(values) - len(current))
+    if current == values:
+        return False
+    spreadsheet.values_batch_update(body={
+        "valueInputOption": "USER_ENTERED",
+        "data": [{"range": quoted("Overview", OVERVIEW_RANGE),
+                  "values": raw_values(values)}],
+    })
+    return True
+
+
+def main():
+    import run
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rebuild-overview", action="store_true",
+                        help="rewrite Overview B2:G13 from the months")
+    args = parser.parse_args()
+    run.SHEET.start()
+    try:
+        report = fetch_year(run.SHEET, list(run.MONTHS.values()))
+        print(render(report, run.COLUMNS))
+        if args.rebuild_overview:
+            if rebuild_overview(run.SHEET, report):
+                print("\n ✅  Overview rebuilt from the month sheets.")
+            else:
+                print("\n ✅  Overview is already up to date.")
+    finally:
+        run.SHEET.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,21 @@
-import gspread
 import os
-from google.oauth2.service_account import Credentials
-from art import *
-from decimal import Decimal
-from colorama import Fore
-from prettytable import PrettyTable
-from termcolor import colored
-from currencies import Currency
-
-# Code and links taken from love-sandwiches project.
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-]
+import sys
+from contextvars import ContextVar
+from datetime import date
+from functools import partial
+from autosave import Autosave
+from fetch import fetch_month, prefetch_month, verified_at
+from formatting import format_expenses, format_many, parse_expense
+import ledger
+from money import MAX_CENTS, Money
+from month_lock import month_lock
+import render
+from sheet_cache import SheetCache
+import snapshot
+from storage import open_storage, refresh_local
+import tracing
+from write_buffer import WriteBuffer, entered_value, quoted, raw_values
+
 # Months the user can select when logging an expense.
 MONTHS = {
     1: "January",
@@ -40,14 +42,15 @@ EXPENSES = {
     6: "Other",
 }
 
-CREDS = Credentials.from_service_account_file("creds.json")
-CREDS_SCOPE = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(CREDS_SCOPE)
-SHEET = GSPREAD_CLIENT.open("Tag-Track")
+# Google Sheets, or a local copy synced in the background (see storage).
+# Every session in the process shares it, and so one authorized client.
+SHEET = open_storage("Tag-Track")
+# The Session served by the running thread or task.
+SESSION = ContextVar("session")
 
-# List of read-only headers from google sheets.
-# These are used in user-feedback throughout the application.
-COLUMNS = []
+# Columns of the categories in month sheets whose second row does not
+# name them (see retrieve_columns()).
+COLUMNS = ledger.column_index(tuple(EXPENSES.values()))
 
 
 def create_user_month():
@@ -69,7 +72,7 @@ def create_user_month():
 
 
 def create_user_budget():
-    """Getter & Setter functions for float budget value.
+    """Getter & Setter functions for Money budget value.
     Returns:
         retrieve & update budget functions."""
     user_budget = None
@@ -77,9 +80,9 @@ def create_user_budget():
     def retrieve_budget():
         return user_budget
 
-    """Updates user_budget with float argument."""
+    """Updates user_budget with Money argument."""
 
-    def update_budget(set_budget: float):
+    def update_budget(set_budget: Money):
         nonlocal user_budget
         user_budget = set_budget
 
@@ -93,7 +96,7 @@ def create_user_budget():
 
 
 def create_user_budget_rem():
-    """Getter & Setter functions for float remainder value.
+    """Getter & Setter functions for Money remainder value.
     Returns:
         retrieve and update budget remainder functions."""
     user_budget_remainder = None
@@ -101,9 +104,9 @@ def create_user_budget_rem():
     def retrieve_rem():
         return user_budget_remainder
 
-    """Updates user_budget_remainder with float argument."""
+    """Updates user_budget_remainder with Money argument."""
 
-    def update_rem(set_remainder: float):
+    def update_rem(set_remainder: Money):
         nonlocal user_budget_remainder
         user_budget_remainder = set_remainder
 
@@ -158,30 +161,212 @@ def create_user_expenses():
     return retrieve_expenses, update_expenses, replace_expenses
 
 
+class Session:
+    """Everything one user's session keeps: the getters & setters made by
+    the create_user_* functions, its write buffer and its cache.
+    Args:
+        sheet (Spreadsheet): Has a default value of the shared SHEET."""
+
+    def __init__(self, sheet=None):
+        # Set when TAG_TRACK_TRACE is (see tracing).
+        self.tracer = tracing.Tracer.from_env()
+        self.sheet = tracing.traced(SHEET if sheet is None else sheet,
+                                    self.tracer)
+        # Writes are collected here and sent in one request per upload.
+        self.buffer = WriteBuffer()
+        # Worksheet handles and values read or written in this session.
+        self.cache = SheetCache(self.buffer)
+        # Months being read ahead, by name (see prefetch()).
+        self.prefetched = {}
+        # Sends expenses as they are confirmed (see autosave_expenses()),
+        # and the writes putting back what it overwrote until uploaded.
+        self.autosave = None
+        self.draft = None
+        # Row an upload appended, and its values, until the upload has
+        # gone through (see take_back_draft()).
+        self.appended = None
+        # Version of each month as this session last read or wrote it.
+        self.versions = {}
+        self.retrieve_month, self.update_month = create_user_month()
+        (self.retrieve_budget, self.update_budget,
+         self.retrieve_formatted_budg) = create_user_budget()
+        (self.retrieve_rem, self.update_rem,
+         self.retrieve_formatted_rem) = create_user_budget_rem()
+        self.retrieve_gsheet, self.update_gsheet = create_user_gsheet()
+        (self.retrieve_expenses, self.update_expenses,
+         self.replace_expenses) = create_user_expenses()
+
+
+def current_session():
+    """Returns:
+    (Session): the session of this thread or task, made on first use."""
+    try:
+        return SESSION.get()
+    except LookupError:
+        session = Session()
+        SESSION.set(session)
+        return session
+
+
+def trace_stage(name: str):
+    """Args:
+        name (str): Name of the flow stage.
+    Returns:
+        a context manager timing the stage when tracing."""
+    return tracing.stage(current_session().tracer, name)
+
+
+def end_autosave(keep=False):
+    """Sends what is left to autosave and stops its thread.
+    Args:
+        keep (bool): Keep expenses that were not uploaded, as for a
+            session cut short, instead of putting back what was there.
+    Returns:
+        (bool): False if expenses that were not uploaded could not be
+        taken back and are still in the month."""
+    import gspread
+
+    session = current_session()
+    restored = True
+    # An upload that did not go through: its row is taken back too.
+    if session.appended is not None and not keep:
+        try:
+            withdraw_draft()
+        except gspread.exceptions.GSpreadException:
+            session.buffer.take()
+            restored = False
+    session.appended = None
+    if session.autosave is None:
+        return restored
+    autosave = session.autosave
+    restore = session.draft is not None and not keep
+    blank = [""] * len(retrieve_columns())
+    if restore:
+        autosave.save(session.draft, blank)
+    autosave.close()
+    # Not sent, as another session has written the month since.
+    if restore and autosave.stale:
+        try:
+            withdraw_draft()
+        except gspread.exceptions.GSpreadException:
+            session.buffer.take()
+            restored = False
+    elif restore and autosave.error is not None:
+        # Tried once more, now that the user waits for it.
+        autosave.send(session.draft, blank)
+        restored = restored and autosave.error is None
+    session.autosave = session.draft = None
+    return restored
+
+
+def end_session():
+    """Keeps autosaved expenses and prints the session's trace on
+    stderr when tracing.
+    Returns: None."""
+    end_autosave(keep=True)
+    tracer = current_session().tracer
+    if tracer is not None:
+        print(tracer.report(), file=sys.stderr)
+
+
+def prefetch(month_name: str):
+    """Starts reading a month in the background, once per session.
+    Args:
+        month_name (str): Name of the month worksheet.
+    Returns: None."""
+    session = current_session()
+    if month_name not in session.prefetched:
+        # Only starts the reads; they count towards this stage.
+        with trace_stage("prefetch"):
+            session.prefetched[month_name] = prefetch_month(
+                session.cache, session.sheet, month_name)
+
+
+def discard_prefetch(month_name: str):
+    """Cancels reading a month ahead if it has not started yet.
+    A read already under way still fills the cache.
+    Returns: None."""
+    prefetched = current_session().prefetched
+    future = prefetched.get(month_name)
+    if future is not None and future.cancel():
+        del prefetched[month_name]
+
+
+def session_function(name: str):
+    """Args:
+        name (str): Name of a Session getter or setter.
+    Returns:
+        a function calling it on the current session."""
+    def call(*args):
+        return getattr(current_session(), name)(*args)
+
+    call.__name__ = name
+    return call
+
+
+def retrieve_columns():
+    """Maps the month's categories to their columns, as the second
+    header row of its sheet names them. Read along with the first row,
+    so it costs no request of its own.
+    Returns:
+        (dict): column of each category, from 0, in column order."""
+    names = retrieve_cache().header(retrieve_gsheet(), ledger.HEADER_ROWS)
+    return ledger.column_index(tuple(names)) or COLUMNS
+
+
+def retrieve_categories():
+    """Returns:
+    (dict): the month's categories by number, like EXPENSES."""
+    return dict(enumerate(retrieve_columns(), 1))
+
+
+def category_cents(expenses: dict):
+    """Args:
+        expenses (dict): Money per category, as check_list() merges it.
+    Returns:
+        (list): cents of each column of the running totals."""
+    cents = [0] * ledger.CATEGORIES
+    for category, column in retrieve_columns().items():
+        if category in expenses:
+            cents[column] = expenses[category].cents
+    return cents
+
+
+def retrieve_cache():
+    """Returns:
+    (SheetCache): the current session's cache."""
+    return current_session().cache
+
+
+def retrieve_month_lock():
+    """Returns:
+    (MonthLock): lock of the session's month worksheet."""
+    return month_lock(current_session().sheet.id, retrieve_gsheet().title)
+
+
 def print_intro():
     """Prints intro heading with colorama styling library.
     Returns: None."""
     clear_terminal()
-    text = text2art("$ Tag - Track")
-    print(Fore.LIGHTGREEN_EX + text + Fore.RESET)
+    print(render.banner())
 
 
 def exit_tag():
-    """Exits the application. Returns: None."""
+    """Exits the application, taking back expenses that were autosaved
+    but not uploaded. Returns: None."""
+    restored = end_autosave()
     clear_terminal()
     print_intro()
+    if not restored:
+        print("\n ❌  Google Sheets is busy: the expenses you did not upload"
+              " are still in your Month sheet.")
     print(f"\n 👋  Thanks for using Tag-Track! See you soon :) \n")
 
 
 def clear_terminal():
-    """Clears the terminal screen for improved UX based on os.
+    """Clears the terminal screen with ANSI escapes (see render).
     Returns: None."""
-    # For windows os.
-    if os.name == "nt":
-        os.system("cls")
-    # For Unix/Linux os.
-    else:
-        os.system("clear")
+    render.clear()
 
 
 def validate_string(string: any):
@@ -222,6 +407,30 @@ def validate_num_selection(num: any):
         return False
 
 
+def parse_amount(value: str):
+    """Reads an amount that validate_num_selection() let through.
+    Args:
+        value (str): The user's input.
+    Returns:
+        (Money): the amount, or None, after telling the user, if it is
+        not one finite number, e.g. "nan" or "1 2", or is beyond
+        money.MAX_CENTS, e.g. "1e17"."""
+    try:
+        amount = Money.parse(value)
+    except ValueError:
+        clear_terminal()
+        print("\n ❌  Invalid input.")
+        print("👉  Please enter a single, finite number.")
+        return None
+    if not amount.in_range():
+        clear_terminal()
+        print("\n ❌  Invalid input.")
+        print(f"👉  Please enter an amount up to "
+              f"{format_expenses(Money(MAX_CENTS))}.")
+        return None
+    return amount
+
+
 def validate_selection(selection: float, num_range: int, min_num_range=0):
     """Validates using validate_num_selection() for number validation.
     Args:
@@ -275,11 +484,8 @@ def create_table(value, heading: str, colour="light_green"):
         heading (str): String to be displayed in second column.
         colour (str): Has a default value of "light_green".
     Returns: None."""
-    table = PrettyTable()
-    table.field_names = [colored("No.", colour), colored(heading, colour)]
-    for num, parameter in value.items():
-        table.add_row([colored(num, "white"), colored(parameter, "white")])
-        table.align = "l"
+    # Built once per list of choices.
+    table = render.menu(tuple(value.items()), heading, colour)
     print(f"\n{table}")
 
 
@@ -287,7 +493,8 @@ def fetch_gsheet_exp():
     """Returns:
     (list): all values of previously logged expenses."""
     gsheet = retrieve_gsheet()
-    return gsheet.get_all_values()[2:]
+    return retrieve_cache().tail(
+        gsheet, ledger.HEADER_ROWS + 1, ledger.LAST_COLUMN)
 
 
 def append_budget():
@@ -298,7 +505,7 @@ def append_budget():
     retrieved_budg = retrieve_budget()
     gsheet = retrieve_gsheet()
     user_budget_format = format_expenses(retrieved_budg)
-    gsheet.update_acell("B1", user_budget_format)
+    retrieve_cache().update_acell(gsheet, "B1", user_budget_format)
 
 
 def append_remainder():
@@ -309,20 +516,21 @@ def append_remainder():
     retrieved_rem = retrieve_rem()
     gsheet = retrieve_gsheet()
     user_rem_format = format_expenses(retrieved_rem)
-    gsheet.update_acell("F1", user_rem_format)
+    retrieve_cache().update_acell(gsheet, "F1", user_rem_format)
 
 
 def retrieve_overview():
     """Returns:
     None, or Overview sheet from Google Sheets."""
-    return SHEET.worksheet("Overview")
+    return retrieve_cache().worksheet(
+        current_session().sheet, "Overview")
 
 
 def retrieve_remainder_value():
     """Returns:
     (str): None, or Current budget remainder from GS."""
     gsheet = retrieve_gsheet()
-    return gsheet.acell("F1").value
+    return retrieve_cache().cell(gsheet, "F1")
 
 
 def retrieve_gsheet_budget():
@@ -330,7 +538,7 @@ def retrieve_gsheet_budget():
     Returns:
         None, or budget (str)."""
     gsheet = retrieve_gsheet()
-    return gsheet.acell("B1").value
+    return retrieve_cache().cell(gsheet, "B1")
 
 
 def remove_formatting(exp_value: str):
@@ -338,27 +546,9 @@ def remove_formatting(exp_value: str):
     Removes currency symbol and converts to float.
     Returns: (float)."""
     if exp_value is None:
-        retrieved_budg = retrieve_budget()
-        return float(str(retrieved_budg)[1:].replace(",", ""))
+        return float(retrieve_budget())
     elif exp_value:
-        neg_pos = exp_value[0]
-        if neg_pos == "-":
-            symbol = exp_value[1]
-            return float(exp_value.replace(",", "").replace(symbol, ""))
-        else:
-            return float(exp_value[1:].replace(",", ""))
-
-
-def format_expenses(expense: float):
-    """Formats the user's expenses with the chosen currency symbol.
-    Args:
-        expense (num): Value of expense.
-    Returns:
-        formatted_expense (str): Formatted Expense."""
-    # Code taken from Currency example on pypi.org
-    currency = Currency('EUR')
-    formatted_expense = currency.get_money_format(expense)
-    return formatted_expense
+        return parse_expense(exp_value)
 
 
 def num_lett(num: int):
@@ -372,34 +562,43 @@ def num_lett(num: int):
 
 
 # _________ End of shared functionalities.
-retrieve_month, update_month = create_user_month()
-retrieve_budget, update_budget, retrieve_formatted_budg = create_user_budget()
-retrieve_rem, update_rem, retrieve_formatted_rem = create_user_budget_rem()
-retrieve_gsheet, update_gsheet = create_user_gsheet()
-retrieve_expenses, update_expenses, replace_expenses = create_user_expenses()
+retrieve_month = session_function("retrieve_month")
+update_month = session_function("update_month")
+retrieve_budget = session_function("retrieve_budget")
+update_budget = session_function("update_budget")
+retrieve_formatted_budg = session_function("retrieve_formatted_budg")
+retrieve_rem = session_function("retrieve_rem")
+update_rem = session_function("update_rem")
+retrieve_formatted_rem = session_function("retrieve_formatted_rem")
+retrieve_gsheet = session_function("retrieve_gsheet")
+update_gsheet = session_function("update_gsheet")
+retrieve_expenses = session_function("retrieve_expenses")
+update_expenses = session_function("update_expenses")
+replace_expenses = session_function("replace_expenses")
 
 
 def ask_name():
     """A loop asking for user name.
-    If valid, calls for month selection from a provided list.
+    If valid, moves on to month selection from a provided list.
     Returns:
-        name (str): User's name."""
+        next screen."""
+    if os.environ.get("TAG_TRACK_WARM_MONTH"):
+        # Most expenses are logged for the current month.
+        prefetch(MONTHS[date.today().month])
     while True:
         name = input("   ➤ Please tell me your name: ").strip()
         if validate_string(name):
             capitalised = name.capitalize()
             clear_terminal()
             print(f"\n ✅  Hey, {capitalised}!")
-            ask_month()
-            break
-    return name
+            return ask_month
 
 
 def ask_month():
     """Displays selection of month options in a table.
-    If valid, calls for currency selection.
+    If valid, fetches the month's worksheet.
     Returns:
-        month_name (str): Month as a string."""
+        next screen, or None to exit."""
     while True:
         create_table(MONTHS, "Month")
         print("\n (💡  Type the 'No.' )")
@@ -407,13 +606,18 @@ def ask_month():
         if validate_selection(month, 12):
             update_month(month)
             month_name = MONTHS[int(month)]
+            # Read the month while the user confirms it.
+            prefetch(month_name)
             user_choice = confirm_input(month_name)
             if user_choice == "p":
-                get_month_sheet(month_name)
-                nextsteps_retr_budget()
-                return month_name
+                if get_month_sheet(month_name) is False:
+                    return None
+                return nextsteps_retr_budget
             elif user_choice == "c":
+                discard_prefetch(month_name)
                 clear_terminal()
+            else:
+                return None
 
 
 def get_month_sheet(month_needed: str):
@@ -422,12 +626,28 @@ def get_month_sheet(month_needed: str):
         month_needed (str): Name of the specified month.
     Returns:
         Gsheet for specified month or False."""
+    import gspread
+
     print(f"Fetching the '{month_needed}' worksheet...\n")
     try:
-        gsheet = update_gsheet(SHEET.worksheet(month_needed))
+        # Budget, remainder, totals and Overview are read in one go,
+        # usually already while the month was being confirmed.
+        future = current_session().prefetched.pop(month_needed, None)
+        with trace_stage("month"):
+            if future is not None:
+                state = future.result()
+            else:
+                state = fetch_month(
+                    retrieve_cache(), current_session().sheet, month_needed)
+        gsheet = state.worksheet
+        update_gsheet(gsheet)
+        # Kept if this session read the month before.
+        current_session().versions.setdefault(month_needed, state.version)
         print("\n ✅  Worksheet retrieved successfully!")
         print(" ⌛  Hold on while we fetch the next table...")
         clear_terminal()
+        if os.environ.get("TAG_TRACK_VERIFY_LEDGER"):
+            verify_ledger()
         return gsheet
     # Code from snyk.io
     except gspread.exceptions.WorksheetNotFound:
@@ -435,6 +655,27 @@ def get_month_sheet(month_needed: str):
         print(" 👉  Please check your internet connection and try again")
         exit_tag()
         return False
+    # Still failing after the rate limiter's retries.
+    except gspread.exceptions.APIError:
+        print("\n ❌  Google Sheets is busy right now.")
+        print(" 👉  Please try again in a minute.")
+        exit_tag()
+        return False
+
+
+def verify_ledger():
+    """Recomputes the month's running totals from every row.
+    Reports and repairs any drift. Returns: None."""
+    gsheet = retrieve_gsheet()
+    drift = ledger.verify(retrieve_cache(), gsheet)
+    categories = retrieve_categories()
+    if not drift:
+        print("\n ✅  Ledger totals match the worksheet.")
+    for key, (stored, actual) in drift.items():
+        name = "Rows" if key == "rows" else categories.get(key, key)
+        print(f" ⚠️  Ledger drift in {name}: {stored} -> {actual}")
+    input("\n ➤  Press Enter to continue...")
+    clear_terminal()
 
 
 # __________ budget handling logic ____________
@@ -443,7 +684,7 @@ def get_month_sheet(month_needed: str):
 def validate_retr_budget(budg):
     """Validates returned budget value.
     Returns:
-        user_budget_input (str): User input."""
+        user_budget_input (str): User input, or None without a budget."""
     if budg:
         clear_terminal()
         month = retrieve_month()
@@ -459,41 +700,41 @@ def validate_retr_budget(budg):
                 print(f"\n✅  Budget for {budg_month}: {budg}")
                 break
             elif user_budget_input == "c":
-                clear_terminal()
-                ask_budget()
                 break
             else:
                 print("\n ❌  Invalid input.")
                 print(" 👉  Please choose either 'u', or 'c' to proceed.")
         return user_budget_input
-    else:
-        ask_budget()
 
 
 def nextsteps_retr_budget():
-    """Calls functions based on user procedure choice.
-    Returns: None."""
-    budg = retrieve_gsheet_budget()
+    """Picks the next screen based on user procedure choice.
+    Returns:
+        next screen."""
+    with trace_stage("budget"):
+        budg = retrieve_gsheet_budget()
     validation = validate_retr_budget(budg)
     if validation == "u":
-        budg = remove_formatting(budg)
-        update_budget(budg)
-        ask_category()
+        update_budget(Money.parse(budg))
+        return ask_category
+    return ask_budget
 
 
 def ask_budget():
     """Asks for budget and updates global budget variable.
-    If valid, calls for category selection.
-    Returns: None."""
+    If valid, asks to confirm it.
+    Returns:
+        next screen."""
     clear_terminal()
     while True:
         month = retrieve_month()
         budg_month = MONTHS[int(month)]
         budget = input(f"\n   ➤  Please enter a budget for {budg_month}: ")
-        if validate_num_selection(budget):
-            update_budget(budget)
-            nextsteps_budget(budg_month)
-            break
+        amount = (parse_amount(budget)
+                  if validate_num_selection(budget) else None)
+        if amount is not None:
+            update_budget(amount)
+            return partial(nextsteps_budget, budg_month)
 
 
 def nextsteps_budget(month: str):
@@ -501,60 +742,67 @@ def nextsteps_budget(month: str):
     Args:
         budget_entry (float): value of budget.
         month (str): budget month.
-    Returns: None."""
+    Returns:
+        next screen, or None to exit."""
     formatted_budget = retrieve_formatted_budg()
     user_choice = confirm_input(formatted_budget)
     if user_choice == "p":
         clear_terminal()
         print(f"\n ✅  Budget for {month}: {formatted_budget}")
-        ask_category()
+        return ask_category
     if user_choice == 'c':
         clear_terminal()
-        ask_budget()
+        return ask_budget
+    return None
 
 
 # __________ end of budget handling logic ____________
 
 
 def ask_category():
-    """Displays categories in a table. If valid, calls for expense value.
-    Returns: cat (num): Number corresponding to category."""
+    """Displays categories in a table. If valid, asks for expense value.
+    Returns:
+        next screen."""
+    categories = retrieve_categories()
     while True:
-        create_table(EXPENSES, "Expense Category")
+        create_table(categories, "Expense Category")
         print("\n (💡  Type the 'No.' )")
         cat = input(" ➤  Please choose a category: ")
-        if validate_selection(cat, 6):
-            ask_expense(EXPENSES[int(cat)])
-            return cat
+        if validate_selection(cat, len(categories)):
+            return partial(ask_expense, categories[int(cat)])
 
 
 def ask_expense(category: str):
-    """Asks for expense in category.If valid, calls expense loop.
+    """Asks for expense in category. If valid, saves it.
     Args:
         category (str): Expense category.
-    Returns: None."""
+    Returns:
+        next screen, or None to exit."""
     while True:
         expense_msg = f" ➤ Enter the amount you spent on {category}: "
         user_exp = input(expense_msg)
-        if validate_num_selection(user_exp):
-            form_expense = format_expenses(user_exp)
+        amount = (parse_amount(user_exp)
+                  if validate_num_selection(user_exp) else None)
+        if amount is not None:
+            form_expense = format_expenses(amount)
             user_choice = confirm_input(form_expense, f' for "{category}".')
             if user_choice == "p":
                 clear_terminal()
                 print("\n ✅  Saved!\n ⌛  Updating your expense log...")
-                update_expenses([category, user_exp])
-                continue_expenses()
-                break
+                update_expenses([category, amount])
+                autosave_expenses()
+                return continue_expenses
             elif user_choice == "c":
                 clear_terminal()
-                ask_category()
-                break
+                return ask_category
+            else:
+                return None
 
 
 def continue_expenses():
     """Expense logging loop with validation.
-    Returns: 
-        (bool): Another expense or continue."""
+    Returns:
+        next screen: another expense or the summary."""
     while True:
         user_answer = (
             input("\n➤  Type 'a' to add an expense, or 'c' to continue.")
@@ -562,15 +810,13 @@ def continue_expenses():
             .lower())
         if user_answer == "a":
             clear_terminal()
-            ask_category()
-            break
+            return ask_category
         elif user_answer == "c":
             clear_terminal()
             print("\n ⌛  Calculating your expenses...")
             month = retrieve_month()
             retrieved_budg = retrieve_budget()
-            create_expense(month, retrieved_budg)
-            break
+            return partial(create_expense, month, retrieved_budg)
         else:
             print(f" ❌  Invalid input: '{user_answer}'.\nPlease try again.")
 
@@ -585,7 +831,6 @@ def check_list():
     non_duplicates = {}
     for item in expenses:
         cat, value = item
-        value = round(float(Decimal(value)), 2)
         if cat in non_duplicates:
             non_duplicates[cat] += value
         else:
@@ -594,23 +839,20 @@ def check_list():
     return non_duplicates
 
 
+def prev_exp_totals():
+    """Reads the running totals of each category from the ledger.
+    Returns:
+        (list): total cents of each category."""
+    gsheet = retrieve_gsheet()
+    totals, _ = ledger.load_totals(retrieve_cache(), gsheet)
+    return totals
+
+
 def sum_prev_exps():
     """Sums the total expenses of each category. 
     Returns: 
         all_values (list)."""
-    gsheet = retrieve_gsheet()
-    all_values = []
-    for col in range(1, 7):
-        column_list = gsheet.col_values(col)[2:]
-        nums_only = []
-        for col_value in column_list:
-            if col_value != '':
-                col_value = remove_formatting(col_value)
-                nums_only.append(col_value)
-            else:
-                continue
-        all_values.append(format_expenses(round((sum(nums_only)), 2)))
-    return all_values
+    return format_many(Money(cents) for cents in prev_exp_totals())
 
 
 def create_expense(month: int, budget: str, colour="light_green"):
@@ -619,103 +861,99 @@ def create_expense(month: int, budget: str, colour="light_green"):
         month (int): Num corresponding to Month selection.
         budget (str): Formatted budget.
         colour (str): Has default value of "light_green".
-    Returns: None."""
-    table = PrettyTable()
+    Returns:
+        next screen."""
+    with trace_stage("summary"):
+        table = summary_table(colour)
+    return nextsteps_expense_table(table)
+
+
+def summary_table(colour: str):
+    """Builds the table of create_expense() in one pass.
+    Returns:
+        (str): the table."""
     budget = retrieve_formatted_budg()
     month = retrieve_month()
     budg_month = MONTHS[int(month)]
-    table.field_names = [
-        colored(f"Expenses for {budg_month}", colour),
-        colored(f"{budg_month}'s budget: {budget}", colour),
+    fields = [
+        (f"Expenses for {budg_month}", colour),
+        (f"{budg_month}'s budget: {budget}", colour),
     ]
-    make_table_body(table)
-    table.add_row(["-----------------------", "-----------------------"])
-    make_table_body_past(table)
-    table.add_row(["-----------------------", "-----------------------"])
-    make_table_footer(table)
-    table.align = "l"
-    nextsteps_expense_table(table)
-
-
-def make_table_body(table):
-    """Makes up current expenses in table. 
-    Args: table (PrettyTable function).
+    rows = []
+    make_table_body(rows)
+    rows.append([("-----------------------", None)] * 2)
+    make_table_body_past(rows)
+    rows.append([("-----------------------", None)] * 2)
+    make_table_footer(rows)
+    return render.table(fields, rows)
+
+
+def make_table_body(rows: list):
+    """Makes up current expenses in table.
+    Args: rows (list): Table rows to add to.
     Returns: None."""
     # Current Expenses.
     valid_cat_exp = check_list()
     for list_cat, list_exp in valid_cat_exp.items():
-        f_exp = format_expenses(round(list_exp, 2))
-        table.add_row([colored(list_cat, "white"), colored(f_exp, "white")])
+        f_exp = format_expenses(list_exp)
+        rows.append([(list_cat, "white"), (f_exp, "white")])
 
 
-def make_table_body_past(table):
-    """Makes up retrieved expenses in table. 
-    Args: table (PrettyTable function).
+def make_table_body_past(rows: list):
+    """Makes up retrieved expenses in table.
+    Args: rows (list): Table rows to add to.
     Returns: None."""
     # Past Expenses.
     prev_exp = sum_prev_exps()
-    cats = ["Rent",
-            "Groceries",
-            "Vehicle",
-            "Cafe/Restaurant",
-            "Online Shopping",
-            "Other"]
-    for value, cat in zip(prev_exp, cats):
-        table.add_row(
-            [colored(f"Past '{cat}' Tags:", "light_yellow"),
-                colored(value, "light_yellow")])
-        
-
-def make_table_footer(table):
-    """Retrieves budget remainder in table footer. 
-    Args: table (PrettyTable function).
+    for value, cat in zip(prev_exp, retrieve_columns()):
+        rows.append(
+            [(f"Past '{cat}' Tags:", "light_yellow"),
+                (value, "light_yellow")])
+
+
+def make_table_footer(rows: list):
+    """Retrieves budget remainder in table footer.
+    Args: rows (list): Table rows to add to.
     Returns: None."""
-    remainder = format_expenses(calculate_budget_remainder())
-    if float(remainder[1:]) < 0:
-        table.add_row(
-            [
-                colored("Your remaining budget:", "red"),
-                colored(remainder, "red"),
-            ]
-        )
-    else:
-        table.add_row(
-            [
-                colored("Your remaining budget:", "green"),
-                colored(remainder, "green"),
-            ]
-        )
+    remaining = calculate_budget_remainder()
+    remainder = format_expenses(remaining)
+    colour = "red" if remaining < Money(0) else "green"
+    rows.append(
+        [("Your remaining budget:", colour), (remainder, colour)])
+
 
 def nextsteps_expense_table(conc_table: str):
     """Prints the conclusive expense table.
     Asks whether to upload to GS or exit.
     Args:
         conc_table (str): Expense table.
-    Returns: None"""
+    Returns:
+        next screen."""
     clear_terminal()
     print(f"\n{conc_table}")
-    ask_update()
+    return ask_update
 
 
 # ________ remainder value logic ___________
 
 
-def calculate_budget_remainder():
-    """Returns:
-    user_budget_remainder (float): Budget remainder post deductions."""
+def budget_remainder(expenses: dict):
+    """Args:
+        expenses (dict): Money per category, as check_list() merges it.
+    Returns:
+        (Money): Budget remainder post deductions."""
     rem = retrieve_remainder_value()
-    prev_exp = sum_prev_exps()
     budget = retrieve_budget()
-    num_only = []
-    for exp in prev_exp:
-        num_only.append(remove_formatting(exp))
-    summed = sum(num_only)
-    if rem is None:
-        set_remainder = float(budget)
-    else:
-        set_remainder = float(budget) - summed
-    total_to_deduct = sum(retrieve_expenses().values())
-    remainder = round(set_remainder - float(total_to_deduct), 2)
+    # Without a stored remainder, nothing has been deducted yet.
+    spent = Money(0 if rem is None else sum(prev_exp_totals()))
+    to_deduct = sum(expenses.values(), Money(0))
+    return budget - spent - to_deduct
+
+
+def calculate_budget_remainder():
+    """Returns:
+    user_budget_remainder (Money): Budget remainder post deductions."""
+    remainder = budget_remainder(retrieve_expenses())
     update_rem(remainder)
     return remainder
 
@@ -723,7 +961,7 @@ def calculate_budget_remainder():
 def ask_update():
     """Asks to update google sheets or quit application.
     Returns:
-        None."""
+        next screen, or None to exit."""
     while True:
         user_update = (
             input("\n ➤ Type 'u' to upload your expenses, or 'q' to exit: ")
@@ -731,11 +969,10 @@ def ask_update():
             .lower()
         )
         if user_update == "u":
-            update_worksheet()
-            break
+            return update_worksheet
         elif user_update == "q":
             exit_tag()
-            break
+            return None
         else:
             print("\n ❌  Invalid input.")
             print(f"You entered '{user_update}'. Please try again.")
@@ -743,15 +980,9 @@ def ask_update():
 
 def format_data():
     """Returns:
-    format (list): sorted user expenses with currency symbol."""
-    format = {
-        "Rent": "",
-        "Groceries": "",
-        "Vehicle": "",
-        "Cafe/Restaurant": "",
-        "Online Shopping": "",
-        "Other": "",
-    }
+    format (dict): user expenses with currency symbol, in the order of
+    the month's columns."""
+    format = dict.fromkeys(retrieve_columns(), "")
     expenses = retrieve_expenses()
     for key, value in expenses.items():
         if key in format:
@@ -767,20 +998,74 @@ def expensive_battleships():
 
 
 def update_cell_actual_value():
-    """Updates cell values + prints confirmation. Returns: None."""
+    """Updates cell values + prints confirmation.
+    Returns:
+        next screen."""
     OV = retrieve_overview()
     cells_to_update = expensive_battleships()
     prev_exps = sum_prev_exps()
     all_values = [prev_exps]
-    # Method Signature Arguments Deprecation warning [in version 6.0.0].
-    OV.update(range_name=cells_to_update, values=all_values)
+    retrieve_cache().update(OV, cells_to_update, all_values)
+    return send_upload()
+
+
+def send_upload():
+    """Sends the queued writes of the upload.
+    If Sheets keeps refusing them, they stay queued to be sent again.
+    Returns:
+        next screen, or None to exit."""
+    import gspread
+
+    session = current_session()
+    try:
+        if session.autosave is not None:
+            # Usually autosave has written all of it already.
+            session.buffer.forget(session.autosave.sent)
+        session.buffer.flush()
+    except gspread.exceptions.APIError:
+        print("\n ❌  Google Sheets is busy, nothing was lost.")
+        return ask_resend
+    gsheet = retrieve_gsheet()
+    session.versions[gsheet.title] = retrieve_month_lock().written()
+    # Nothing left to put back; a next month starts a new one.
+    end_autosave(keep=True)
+    # The next run starts from the row just written.
+    spreadsheet_id = current_session().sheet.id
+    verified = verified_at(retrieve_cache(), gsheet,
+                           snapshot.load(spreadsheet_id, gsheet.title))
+    snapshot.save(spreadsheet_id, gsheet.title, snapshot.from_header(
+        retrieve_cache().header(gsheet), verified))
     print("\n ✅  We've successfully updated your Month sheet!")
     print("Check your Overview sheet to view your entire expense history.")
-    ask_to_exit()
+    return ask_to_exit
+
+
+def ask_resend():
+    """Asks to try the upload again or quit, losing it.
+    A retry reads the month again, as others may have written it since.
+    Returns:
+        next screen, or None to exit."""
+    while True:
+        user_retry = (
+            input("\n ➤ Type 'r' to retry the upload, or 'q' to exit: ")
+            .strip()
+            .lower()
+        )
+        if user_retry == "r":
+            current_session().buffer.take()
+            return update_worksheet
+        elif user_retry == "q":
+            exit_tag()
+            return None
+        else:
+            print("\n ❌  Invalid input.")
+            print(f"You entered '{user_retry}'. Please try again.")
 
 
 def ask_to_exit():
-    """Exits application. Returns: None."""
+    """Exits or restarts application.
+    Returns:
+        next screen, or None to exit."""
     while True:
         ex_user = (input(
             "\nPlease type 'q' to exit, or 's' to re-start the application: ")
@@ -788,13 +1073,12 @@ def ask_to_exit():
             .lower())
         if ex_user == 'q':
             exit_tag()
-            break
+            return None
         elif ex_user == 's':
             # Reset expenses from a dict to empty list.
             replace_expenses([])
             clear_terminal()
-            ask_month()
-            break
+            return ask_month
         else:
             print(f"\n ❌  Invalid input '{ex_user}'.")
             print(" 👉  Please choose either 'q', or 's' to proceed.")
@@ -802,22 +1086,248 @@ def ask_to_exit():
 
 def update_worksheet():
     """Updates relevant Google Sheet with user's expenses.
-    Returns: None."""
+    Returns:
+        next screen."""
+    import gspread
+
     print("⌛  Updating your worksheet...")
+    session = current_session()
+    with trace_stage("upload"):
+        if session.autosave is not None:
+            # Its last save is part of the sheet as it is now.
+            session.autosave.drain()
+        # Other sessions of the process write the month after this.
+        with retrieve_month_lock():
+            try:
+                refresh_month()
+            except gspread.exceptions.APIError:
+                print("\n ❌  Google Sheets is busy, nothing was lost.")
+                return ask_resend
+            return upload_expenses()
+
+
+def refresh_month():
+    """Reads the month's header rows and the rows after its running
+    totals again, in one request, so the upload adds to the sheet as it
+    is now rather than as this session first read it.
+    Returns: None."""
+    session = current_session()
+    gsheet = retrieve_gsheet()
+    cache = retrieve_cache()
+    _, row_count = ledger.load_totals(cache, gsheet, store=False)
+    # Rows others added since are after the ones this session read,
+    # unless it read every row, e.g. for fetch.RESCAN_AFTER.
+    first_row = ledger.tail_start(row_count)
+    if cache.covers(gsheet.title, ledger.HEADER_ROWS + 1):
+        first_row = ledger.HEADER_ROWS + 1
+    # E.g. totals brought up to date from the month as read before.
+    session.buffer.take()
+    refresh_local(session.sheet, gsheet.title)
+    cache.invalidate(gsheet.title)
+    cache.prime(session.sheet, gsheet.title, ledger.HEADER_RANGE,
+                first_row, ledger.LAST_COLUMN)
+
+
+def take_back_draft():
+    """Takes the row this session appended, by autosave or by an upload
+    that did not go through, out of the month as just read, so the
+    expenses are written once.
+    Returns:
+        (int): the row, now blank, or None if there was none to take."""
+    session = current_session()
+    gsheet = retrieve_gsheet()
+    if session.appended is not None:
+        row, sent = session.appended
+    elif session.autosave is not None and session.autosave.row is not None:
+        row = session.autosave.row
+        sent = session.autosave.sent.get(
+            quoted(gsheet.title, expense_range(row)))
+    else:
+        return None
+    cache = retrieve_cache()
+    rows = cache.tail(gsheet, row, ledger.LAST_COLUMN)
+    current = rows[0] if rows else []
+    # Unless it was written over since.
+    if sent and [entered_value(value) for value in sent[0]] == (
+            current + [""] * len(sent[0]))[:len(sent[0])]:
+        if ledger.remove_row(cache, gsheet, row, len(retrieve_columns())):
+            return row
+    return None
+
+
+def withdraw_draft():
+    """Takes the autosaved expenses back out of the month as it is now,
+    for when another session has written it since they were saved.
+    Returns: None."""
+    session = current_session()
+    gsheet = retrieve_gsheet()
+    cache = retrieve_cache()
+    with retrieve_month_lock() as lock:
+        refresh_month()
+        before = sum(prev_exp_totals())
+        if take_back_draft() is None:
+            return
+        taken = Money(before - sum(prev_exp_totals()))
+        remainder = retrieve_remainder_value()
+        if remainder is not None:
+            cache.update_acell(gsheet, "F1", format_expenses(
+                Money.parse(remainder) + taken))
+        cache.update(retrieve_overview(), expensive_battleships(),
+                     [sum_prev_exps()])
+        session.buffer.flush()
+        session.versions[gsheet.title] = lock.written()
+
+
+def upload_expenses():
+    """Writes the expenses, budget, remainder and totals, then Overview.
+    Returns:
+        next screen."""
+    session = current_session()
+    gsheet = retrieve_gsheet()
+    cache = retrieve_cache()
+    # The row autosave wrote gets the expenses as uploaded.
+    row = take_back_draft()
+    # From the month as just read, not as the summary showed it.
+    spent = sum(prev_exp_totals())
+    calculate_budget_remainder()
+    values = list(format_data().values())
+    cents = category_cents(retrieve_expenses())
+    if row is None:
+        # Sheets picks the row, so another client's upload of the same
+        # month is not written over; the totals follow it from there.
+        row = cache.append_row(gsheet, values)
+        session.appended = row, [values]
+        ledger.load_totals(cache, gsheet)
+    else:
+        ledger.record_row(cache, gsheet, cents, row)
+        cache.append_row(gsheet, values, row)
+    # Rows others appended since the month was read count too.
+    others = sum(prev_exp_totals()) - spent - sum(cents)
+    if others:
+        update_rem(retrieve_rem() - Money(others))
     append_remainder()
     append_budget()
-    expenses = format_data()
-    values_to_append = list(expenses.values())
+    return update_cell_actual_value()
+
+
+def autosave_expenses():
+    """Sends the expenses confirmed so far in the background, to the
+    cells the upload will write, so they outlast a dropped session.
+    Returns: None."""
+    import gspread
+
+    session = current_session()
+    merged = {}
+    for category, value in retrieve_expenses():
+        merged[category] = merged.get(category, Money(0)) + value
+    try:
+        restore = session.draft or restore_data()
+        data, values = draft_data(merged)
+    # E.g. no Overview: the upload reports it, autosave just skips.
+    except gspread.exceptions.GSpreadException:
+        return
+    if session.autosave is None:
+        title = retrieve_gsheet().title
+        # Its saves only go out while no other session has written the
+        # month since this one read it.
+        session.autosave = Autosave(
+            session.sheet, retrieve_month_lock(), title,
+            session.versions.get(title, 0), session.tracer)
+        session.autosave.start()
+    session.draft = restore
+    session.autosave.save(data, values)
+
+
+def expense_range(row: int):
+    """Args:
+        row (int): Number of an expense row.
+    Returns:
+        (str): the row's cells, one per category of the month, as
+        upload_expenses() and autosave write them."""
+    last = chr(ord("A") + len(retrieve_columns()) - 1)
+    return f"A{row}:{last}{row}"
+
+
+def draft_data(expenses: dict):
+    """Works out the writes upload_expenses() would queue for expenses,
+    from the month as this session read it. Nothing is written.
+    Args:
+        expenses (dict): Money per category, as check_list() merges it.
+    Returns:
+        (tuple): values batch_update data, and the expense row's values
+        (see Autosave.save())."""
+    gsheet = retrieve_gsheet()
+    totals, row_count = ledger.load_totals(
+        retrieve_cache(), gsheet, store=False)
+    cents = category_cents(expenses)
+    totals = [total + value for total, value in zip(totals, cents)]
+    values = [format_expenses(expenses[cat]) if cat in expenses else ""
+              for cat in retrieve_columns()]
+    buffer = WriteBuffer()
+    buffer.queue(gsheet, "F1",
+                 [[format_expenses(budget_remainder(expenses))]])
+    buffer.queue(gsheet, "B1", [[format_expenses(retrieve_budget())]])
+    # As if the row lands right after the last one read; if not, the
+    # checksum tells the next read (see ledger.follow_tail()).
+    buffer.queue(gsheet, ledger.LEDGER_RANGE, [ledger.ledger_values(
+        totals, row_count + 1, ledger.row_checksum(cents))], raw=True)
+    buffer.queue(retrieve_overview(), expensive_battleships(),
+                 [format_many(Money(total) for total in totals)], raw=True)
+    return buffer.take(), raw_values([values])[0]
+
+
+def restore_data():
+    """Works out the writes putting back the cells draft_data() writes,
+    as this session read them, but for the expense row, which ends up
+    blank (see end_autosave()).
+    Returns:
+        (list): values batch_update data."""
     gsheet = retrieve_gsheet()
-    gsheet.append_row(values_to_append)
-    update_cell_actual_value()
+    cache = retrieve_cache()
+    header = cache.header(gsheet)
+    header = header + [""] * (ledger.LEDGER_START + ledger.CATEGORIES + 2)
+    overview = retrieve_overview()
+    # Read along with the month (see fetch_month()).
+    overview_row = cache.header(overview, int(retrieve_month()) + 1)
+    overview_row = overview_row + [""] * (ledger.CATEGORIES + 1)
+    buffer = WriteBuffer()
+    buffer.queue(gsheet, "F1", [[header[5]]])
+    buffer.queue(gsheet, "B1", [[header[1]]])
+    end = ledger.LEDGER_START + ledger.CATEGORIES + 2
+    buffer.queue(gsheet, ledger.LEDGER_RANGE,
+                 [header[ledger.LEDGER_START:end]], raw=True)
+    buffer.queue(overview, expensive_battleships(),
+                 [overview_row[1:ledger.CATEGORIES + 1]], raw=True)
+    return buffer.take()
+
+
+def run_screens(screen):
+    """Shows screens one after another until one returns None.
+    Each screen returns the next one instead of calling it, so the
+    stack stays flat however long the session runs.
+    Args:
+        screen (callable): First screen.
+    Returns: None."""
+    while screen is not None:
+        screen = screen()
 
 
 def main():
-    """Starts application.
+    """Starts application, or runs a command such as "add" (see cli).
     Returns: None."""
+    if len(sys.argv) > 1:
+        import cli
+
+        sys.exit(cli.main(sys.argv[1:], sys.modules[__name__]))
     print_intro()
-    ask_name()
+    # Authenticate while the user types their name.
+    SHEET.start()
+    try:
+        run_screens(ask_name)
+    finally:
+        end_session()
+        SHEET.close()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Serves many Tag-Track sessions from one long-lived process.
+
+Every TCP connection gets its own run.Session and goes through the
+usual prompt flow in a worker thread. All sessions share run.SHEET, so
+the process authorizes once and keeps one gspread client and its pool
+of HTTP connections. Printing and input() inside a session are routed
+to that session's connection. Sessions writing the same month take
+turns (see month_lock).
+
+    python3 server.py --port 8022
+
+index.js connects browser terminals here when TAG_TRACK_SERVER is set,
+instead of spawning a run.py process for each of them.
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import queue
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import run
+
+# The Terminal of the session running in this thread.
+TERMINAL = contextvars.ContextVar("terminal")
+
+BACKSPACES = (8, 127)
+ESCAPE = 27
+
+
+class Terminal:
+    """One connection as seen from its session's thread.
+    Typed bytes arrive through feed() on the event loop and are read a
+    line at a time with readline(), like sys.stdin.
+    Args:
+        loop (AbstractEventLoop): Loop owning the connection.
+        writer (StreamWriter): Connection to write to.
+        echo (bool): Echo typed characters back, as a pty would."""
+
+    def __init__(self, loop, writer, echo=True):
+        self.loop = loop
+        self.writer = writer
+        self.echo = echo
+        self.lines = queue.Queue()
+        self._line = bytearray()
+        self._last = None
+        self._escape = False
+
+    def feed(self, data: bytes):
+        """Edits the typed line and queues it once complete.
+        Returns: None."""
+        echoed = bytearray()
+        for byte in data:
+            last, self._last = self._last, byte
+            if self._escape:
+                # Arrow keys and the like: skip the whole sequence.
+                self._escape = byte == ord("[") or byte < 0x40
+            elif byte == ESCAPE:
+                self._escape = True
+            elif byte == 10 and last == 13:
+                continue
+            elif byte in (10, 13):
+                self.lines.put(self._line.decode(errors="replace") + "\n")
+                self._line = bytearray()
+                echoed += b"\r\n"
+            elif byte in BACKSPACES and self._line:
+                # Drop a whole UTF-8 character.
+                while self._line.pop() & 0xC0 == 0x80:
+                    pass
+                echoed += b"\b \b"
+            elif byte in (3, 4):
+                self.hang_up()
+            elif byte >= 32 and byte not in BACKSPACES:
+                self._line.append(byte)
+                echoed.append(byte)
+        if self.echo and echoed:
+            self.writer.write(bytes(echoed))
+
+    def hang_up(self):
+        """Ends the session at its next input(). Returns: None."""
+        self.lines.put("")
+
+    def readline(self):
+        # An empty string makes input() raise EOFError.
+        return self.lines.get()
+
+    def write(self, text: str):
+        data = text.replace("\n", "\r\n").encode()
+        self.loop.call_soon_threadsafe(self.writer.write, data)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Routed:
+    """Stands in for sys.stdin and sys.stdout, passing every call to the
+    current session's Terminal, or to the process's own stream outside
+    of sessions.
+    Args:
+        stream (file): The process's own stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def _target(self):
+        return TERMINAL.get(self.stream)
+
+    def readline(self):
+        return self._target().readline()
+
+    def write(self, text: str):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        return self._target().isatty()
+
+
+def run_session(terminal):
+    """Runs one user's prompt flow until they quit or disconnect.
+    Args:
+        terminal (Terminal): The user's connection.
+    Returns: None."""
+    TERMINAL.set(terminal)
+    run.SESSION.set(run.Session())
+    try:
+        run.print_intro()
+        run.run_screens(run.ask_name)
+    except EOFError:
+        pass
+    except Exception:
+        traceback.print_exc()
+        print("\n ❌  Something went wrong. Please reconnect.")
+    finally:
+        run.end_session()
+
+
+class Server:
+    """Accepts connections and runs a session for each.
+    Args:
+        sessions (int): Sessions running at the same time; more wait.
+        echo (bool): Echo typed characters, for raw terminals."""
+
+    def __init__(self, sessions=100, echo=True):
+        self.echo = echo
+        self.pool = ThreadPoolExecutor(sessions, "session")
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        terminal = Terminal(loop, writer, self.echo)
+        # A fresh context, so nothing leaks from the thread's last session.
+        context = contextvars.Context()
+        session = loop.run_in_executor(
+            self.pool, context.run, run_session, terminal)
+        # Closing the connection also ends the read loop below.
+        session.add_done_callback(lambda _: writer.close())
+        while True:
+            try:
+                data = await reader.read(1024)
+            except ConnectionError:
+                break
+            if not data:
+                break
+            terminal.feed(data)
+        terminal.hang_up()
+        await session
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Tag-Track serving on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8022)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--no-echo", action="store_true",
+                        help="for clients that echo themselves, e.g. nc")
+    args = parser.parse_args()
+    # Connections are not ttys of this process, but do show colours.
+    os.environ.setdefault("FORCE_COLOR", "1")
+    sys.stdin, sys.stdout = Routed(sys.stdin), Routed(sys.stdout)
+    # Authorize once, for every session.
+    run.SHEET.start()
+    try:
+        asyncio.run(Server(args.sessions, not args.no_echo).serve(
+            args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        run.SHEET.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+from write_buffer import append_values, quoted, raw_values
+
+
+class SheetCache:
+    """Session-scoped cache of worksheet handles and worksheet values.
+    Writes made through the cache update the cached values as well,
+    so the app never re-downloads data it has just written.
+    With a WriteBuffer, writes are queued until buffer.flush().
+    gspread is imported on first use so the app starts without it."""
+
+    def __init__(self, buffer=None):
+        self.buffer = buffer
+        self._worksheets = {}
+        self._values = {}
+        # Title -> {row number: values} of rows read on their own.
+        self._headers = {}
+        # Title -> (first row, rows from it to the end of the sheet).
+        self._tails = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def worksheet(self, spreadsheet, title: str):
+        """Args:
+            spreadsheet (Spreadsheet): Spreadsheet holding the worksheet.
+            title (str): Name of the worksheet.
+        Returns:
+            (Worksheet): cached worksheet handle."""
+        hit = title in self._worksheets
+        self._count(hit)
+        if not hit:
+            self._worksheets[title] = spreadsheet.worksheet(title)
+        return self._worksheets[title]
+
+    def values(self, worksheet):
+        """Args:
+            worksheet (Worksheet): Worksheet to read.
+        Returns:
+            (list): all rows of the worksheet, read once per session."""
+        hit = worksheet.title in self._values
+        self._count(hit)
+        if not hit:
+            self._values[worksheet.title] = worksheet.get_all_values()
+        return self._values[worksheet.title]
+
+    def header(self, worksheet, row=1):
+        """Reads only one of the first rows when the whole sheet is not
+        needed.
+        Args:
+            worksheet (Worksheet): Worksheet to read.
+            row (int): Row to read, from 1. Has a default value of 1.
+        Returns:
+            (list): values of the row."""
+        rows = self._values.get(worksheet.title)
+        if rows is not None:
+            self._count(True)
+            return rows[row - 1] if len(rows) >= row else []
+        headers = self._headers.setdefault(worksheet.title, {})
+        hit = row in headers
+        self._count(hit)
+        if not hit:
+            headers[row] = worksheet.row_values(row)
+        return headers[row]
+
+    def tail(self, worksheet, first_row: int, last_col: str):
+        """Reads the rows from first_row to the end of the sheet, once.
+        Later calls for first_row or any row below it are served from
+        the cache, which writes keep up to date.
+        Args:
+            worksheet (Worksheet): Worksheet to read.
+            first_row (int): First row to read, from 1.
+            last_col (str): Last column to read.
+        Returns:
+            (list): rows from first_row on, as get_all_values() has
+            them but without trailing empty cells."""
+        title = worksheet.title
+        rows = self._values.get(title)
+        if rows is not None:
+            self._count(True)
+            return rows[first_row - 1:]
+        cached = self._tails.get(title)
+        hit = cached is not None and cached[0] <= first_row
+        self._count(hit)
+        if not hit:
+            response = worksheet.spreadsheet.values_batch_get(
+                [quoted(title, f"A{first_row}:{last_col}")])
+            rows = response["valueRanges"][0].get("values", [])
+            cached = self._tails[title] = (first_row, rows)
+        start, rows = cached
+        return rows[first_row - start:]
+
+    def covers(self, title: str, first_row: int):
+        """Returns:
+        (bool): whether the rows from first_row on are cached, so
+        tail() serves them without a request."""
+        if title in self._values:
+            return True
+        cached = self._tails.get(title)
+        return cached is not None and cached[0] <= first_row
+
+    def prime(self, spreadsheet, title: str, header_range: str,
+              first_row=None, last_col=None):
+        """Reads the first rows, and the rows from first_row on if
+        given, in one values batch_get without opening the worksheet
+        first. Later header() and tail() calls are served from what was
+        read. Nothing is read if the first row is cached already.
+        Args:
+            spreadsheet (Spreadsheet): Spreadsheet holding the worksheet.
+            title (str): Name of the worksheet.
+            header_range (str): Part of the first rows to read, from A1.
+            first_row (int): First row of the tail, from 1, or None.
+            last_col (str): Last column of the tail.
+        Returns: None."""
+        from gspread.utils import a1_range_to_grid_range
+
+        # Already read this session.
+        if 1 in self._headers.get(title, {}) or title in self._values:
+            return
+        ranges = [quoted(title, header_range)]
+        if first_row is not None:
+            ranges.append(quoted(title, f"A{first_row}:{last_col}"))
+        response = spreadsheet.values_batch_get(ranges)
+        header, *tail = [value_range.get("values", [])
+                         for value_range in response["valueRanges"]]
+        # Rows past the last one with values are left out of the answer.
+        count = a1_range_to_grid_range(header_range)["endRowIndex"]
+        header += [[] for _ in range(count - len(header))]
+        self._headers[title] = dict(enumerate(header, 1))
+        if tail:
+            self._tails[title] = (first_row, tail[0])
+
+    def cell(self, worksheet, label: str):
+        """Args:
+            worksheet (Worksheet): Worksheet to read.
+            label (str): Cell in A1 notation, e.g. "B1".
+        Returns:
+            (str): None, or value of the cell."""
+        from gspread.utils import a1_to_rowcol
+
+        row, col = a1_to_rowcol(label)
+        rows = [self.header(worksheet)] if row == 1 else self.values(worksheet)
+        try:
+            value = rows[row - 1][col - 1]
+        except IndexError:
+            return None
+        # Match acell(), which returns None for empty cells.
+        return value if value != "" else None
+
+    def update_acell(self, worksheet, label: str, value):
+        """Writes a single cell and mirrors it in the cache.
+        Returns: None."""
+        from gspread.utils import a1_to_rowcol
+
+        if self.buffer is None:
+            worksheet.update_acell(label, value)
+        else:
+            self.buffer.queue(worksheet, label, [[value]])
+        row, col = a1_to_rowcol(label)
+        self._patch(worksheet.title, row - 1, col - 1, [[value]])
+
+    def append_row(self, worksheet, values: list, row=None):
+        """Appends a row to the worksheet and to the cache.
+        Without a row number the row is appended at once, even with a
+        WriteBuffer: only Sheets knows where the sheet ends when others
+        append to it too.
+        Args:
+            worksheet (Worksheet): Worksheet to be written.
+            values (list): Values of the new row, stored as typed.
+            row (int): Row number of the new row, if already known,
+                e.g. a blank row appended before.
+        Returns:
+            (int): number of the row written."""
+        from gspread.utils import rowcol_to_a1
+
+        title = worksheet.title
+        if row is None:
+            row = append_values(
+                worksheet.spreadsheet, title, raw_values([values])[0])
+        else:
+            range_name = (
+                f"{rowcol_to_a1(row, 1)}:{rowcol_to_a1(row, len(values))}")
+            if self.buffer is None:
+                worksheet.update(range_name=range_name, values=[values])
+            else:
+                self.buffer.queue(worksheet, range_name, [values], raw=True)
+        rows = self._values.get(title)
+        if rows is not None:
+            # Rows others appended were not read: read them again.
+            if row > len(rows) + 1:
+                del self._values[title]
+            else:
+                self._patch_rows(rows, row - 1, 0, [values])
+        tail = self._tails.get(title)
+        if tail is not None:
+            first, rows = tail
+            if row > first + len(rows):
+                del self._tails[title]
+            elif row >= first:
+                self._patch_rows(rows, row - first, 0, [values])
+        return row
+
+    def update(self, worksheet, range_name: str, values: list):
+        """Writes a range of cells and mirrors it in the cache.
+        Returns: None."""
+        from gspread.utils import a1_range_to_grid_range
+
+        if self.buffer is None:
+            # Method Signature Arguments Deprecation warning [in 6.0.0].
+            worksheet.update(range_name=range_name, values=values)
+        else:
+            self.buffer.queue(worksheet, range_name, values, raw=True)
+        grid = a1_range_to_grid_range(range_name)
+        self._patch(
+            worksheet.title,
+            grid.get("startRowIndex", 0),
+            grid.get("startColumnIndex", 0),
+            values,
+        )
+
+    def _patch(self, title: str, start_row: int, start_col: int, values):
+        """Overwrites cached cells from a 0-based top-left corner."""
+        for number, header in self._headers.get(title, {}).items():
+            offset = number - 1 - start_row
+            if 0 <= offset < len(values):
+                self._patch_rows(
+                    [header], 0, start_col, values[offset:offset + 1])
+        rows = self._values.get(title)
+        if rows is not None:
+            self._patch_rows(rows, start_row, start_col, values)
+            self._trim(rows)
+        tail = self._tails.get(title)
+        if tail is not None:
+            first, rows = tail
+            # Only the part of the write from the tail's first row on.
+            skip = max(0, first - 1 - start_row)
+            if skip < len(values):
+                self._patch_rows(rows, start_row + skip - (first - 1),
+                                 start_col, values[skip:])
+                self._trim(rows)
+
+    @staticmethod
+    def _patch_rows(rows: list, start_row: int, start_col: int, values):
+        """Writes values into a list of rows in place, padding as needed."""
+        for row_offset, row_values in enumerate(values):
+            row_index = start_row + row_offset
+            while len(rows) <= row_index:
+                rows.append([])
+            row = rows[row_index]
+            for col_offset, value in enumerate(row_values):
+                col_index = start_col + col_offset
+                if len(row) <= col_index:
+                    row.extend([""] * (col_index + 1 - len(row)))
+                row[col_index] = value
+
+    @staticmethod
+    def _trim(rows: list):
+        """Drops rows left empty at the end, as reads leave them out."""
+        while rows and not any(rows[-1]):
+            rows.pop()
+
+    def invalidate(self, title=None):
+        """Drops cached values for one worksheet, or for all of them.
+        Worksheet handles are kept, as they do not go stale.
+        Returns: None."""
+        if title is None:
+            self._values.clear()
+            self._headers.clear()
+            self._tails.clear()
+        else:
+            self._values.pop(title, None)
+            self._headers.pop(title, None)
+            self._tails.pop(title, None)
+
+    def stats(self):
+        """Returns:
+        (dict): hit and miss counters plus cached worksheet names."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "worksheets": sorted(self._worksheets),
+            "values": sorted(self._values),
+            "headers": sorted(self._headers),
+            "tails": sorted(self._tails),
+        }
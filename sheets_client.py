@@ -0,0 +1,80 @@
+import threading
+
+# Code and links taken from love-sandwiches project.
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+]
+# Connections kept open to Google, shared by every session of a server.
+POOL_SIZE = 32
+
+
+def open_spreadsheet(name: str, creds_file="creds.json"):
+    """Authorizes a gspread client and opens a spreadsheet.
+    gspread and google-auth are imported here as they are slow to load.
+    Args:
+        name (str): Name of the spreadsheet.
+        creds_file (str): Path to the service account credentials.
+    Returns:
+        (tuple): authorized client and opened spreadsheet."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from requests.adapters import HTTPAdapter
+
+    creds = Credentials.from_service_account_file(creds_file)
+    client = gspread.authorize(creds.with_scopes(SCOPE))
+    client.session.mount("https://", HTTPAdapter(pool_maxsize=POOL_SIZE))
+    return client, client.open(name)
+
+
+class LazySpreadsheet:
+    """Stands in for a gspread Spreadsheet that is opened on first use.
+    start() opens it in a background thread; any attribute access
+    blocks until it is open and then behaves like the real spreadsheet."""
+
+    def __init__(self, name: str, creds_file="creds.json"):
+        self._name = name
+        self._creds_file = creds_file
+        self._lock = threading.Lock()
+        self._thread = None
+        self._error = None
+        self.client = None
+        self.spreadsheet = None
+
+    def _connect(self):
+        try:
+            self.client, self.spreadsheet = open_spreadsheet(
+                self._name, self._creds_file)
+        except Exception as error:
+            # Raised again in the thread that first needs the spreadsheet.
+            self._error = error
+
+    def start(self):
+        """Starts connecting in a background thread, once.
+        Returns: None."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._connect, name="sheets-connect", daemon=True)
+                self._thread.start()
+
+    def get(self):
+        """Waits for the connection, starting it if needed.
+        Returns:
+            (Spreadsheet): the opened spreadsheet."""
+        self.start()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.spreadsheet
+
+    def close(self):
+        """Nothing to release; gspread keeps no open state.
+        Returns: None."""
+
+    def __getattr__(self, name):
+        # Only called for attributes the proxy itself does not define.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
@@ -0,0 +1,125 @@
+"""First rows of the month sheets, kept on disk between runs.
+
+A new process knows nothing of the sheets, so loading a month costs
+two rounds of requests: opening the worksheet while its header rows are
+read, then the rows after its running totals (see ledger). With a
+snapshot of the first row from an earlier run, fetch_month() reads the
+header rows and the tail in one values batch_get, while the worksheet
+opens.
+
+Each worksheet gets one small binary file in TAG_TRACK_SNAPSHOTS
+(default "tag-track-snapshots", set it empty to switch snapshots off),
+keyed by spreadsheet id and title. It holds the budget, remainder and
+category totals as integer cents, as revision marker the row count and
+checksum of the last row, and when the totals were last found to match
+every row of the month (see fetch.RESCAN_AFTER). A snapshot is only a
+hint: the rows read with it are checked as usual, and it is rewritten
+whenever the sheet says otherwise.
+"""
+import os
+import struct
+import threading
+from collections import namedtuple
+from urllib.parse import quote
+import ledger
+from money import Money
+
+MAGIC = b"TTS2"
+# Magic, checksum, row count, budget, remainder, time verified and
+# category totals.
+RECORD = struct.Struct("<4s8s" + "q" * (4 + ledger.CATEGORIES))
+# Stands for an empty budget or remainder cell.
+EMPTY = -2 ** 63
+
+# verified: Unix time the totals last matched every row, 0 if never.
+Snapshot = namedtuple(
+    "Snapshot",
+    ["row_count", "checksum", "budget", "remainder", "totals", "verified"])
+
+
+def directory():
+    """Returns:
+    (str): folder of the snapshots, or "" when they are off."""
+    return os.environ.get("TAG_TRACK_SNAPSHOTS", "tag-track-snapshots")
+
+
+def path(spreadsheet_id: str, title: str):
+    """Returns:
+    (str): file of the worksheet's snapshot, or None when off."""
+    folder = directory()
+    if not folder:
+        return None
+    name = quote(f"{spreadsheet_id}.{title}", safe="") + ".snap"
+    return os.path.join(folder, name)
+
+
+def cents(cell: str):
+    """Returns:
+    (int): cents of a budget or remainder cell, EMPTY if empty."""
+    return Money.parse(cell).cents if cell else EMPTY
+
+
+def from_header(header: list, verified=0):
+    """Args:
+        header (list): Values of a month sheet's first row.
+        verified (int): Unix time its totals last matched every row.
+    Returns:
+        (Snapshot): the snapshot of it, or None without running totals
+        to mark its revision."""
+    found = ledger.read_ledger(header)
+    checksum = ledger.read_checksum(header)
+    if found is None:
+        return None
+    totals, row_count = found
+    cells = header + [""] * (6 - len(header))
+    return Snapshot(row_count, checksum, cents(cells[1]), cents(cells[5]),
+                    totals, verified)
+
+
+def load(spreadsheet_id: str, title: str):
+    """Returns:
+    (Snapshot): the worksheet's snapshot, or None if there is none or
+    it cannot be read."""
+    file = path(spreadsheet_id, title)
+    if file is None:
+        return None
+    try:
+        with open(file, "rb") as stream:
+            data = stream.read(RECORD.size + 1)
+    except OSError:
+        return None
+    if len(data) != RECORD.size:
+        return None
+    magic, checksum, row_count, budget, remainder, verified, *totals = (
+        RECORD.unpack(data))
+    if magic != MAGIC:
+        return None
+    checksum = checksum.rstrip(b"\0").decode("ascii", "replace") or None
+    return Snapshot(row_count, checksum, budget, remainder, totals,
+                    verified)
+
+
+def save(spreadsheet_id: str, title: str, snapshot):
+    """Writes the worksheet's snapshot, replacing the old one at once.
+    A snapshot that cannot be written is left out: it only saves time.
+    Returns: None."""
+    file = path(spreadsheet_id, title)
+    if file is None or snapshot is None:
+        return
+    try:
+        data = RECORD.pack(
+            MAGIC, (snapshot.checksum or "").encode("ascii", "replace"),
+            snapshot.row_count, snapshot.budget, snapshot.remainder,
+            snapshot.verified, *snapshot.totals)
+    # E.g. a budget typed into the sheet beyond what 64 bits hold.
+    except struct.error:
+        return
+    # Sessions of one server may save the same month at once.
+    temporary = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(temporary, "wb") as stream:
+            stream.write(data)
+        os.replace(temporary, file)
+    except OSError:
+        pass
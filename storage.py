@@ -0,0 +1,565 @@
+"""Storage backends for the Tag-Track spreadsheet.
+
+run.py only uses the following part of gspread, so anything providing
+it can stand in for Google Sheets:
+
+    Spreadsheet: id, title, worksheet(title), values_batch_get(ranges),
+                 values_batch_update(body), values_append(range, params,
+                 body)
+    Worksheet:   title, spreadsheet, get_all_values(), row_values(row),
+                 col_values(col), acell(label), update_acell(label, value),
+                 append_row(values), update(range_name, values)
+
+gspread implements it directly. LocalSpreadsheet implements it on top
+of a SQLite file and queues every write in an outbox, which SyncWorker
+pushes to Google Sheets in the background. WrappedSpreadsheet runs the
+calls of any of them through a wrapper, such as a rate limiter.
+
+A local copy is checked against Google Sheets whenever a session opens
+a month or uploads to it (see refresh_local()): if others have written
+the worksheet since, it is downloaded again. SyncWorker checks it in
+the background, so the prompts never wait on Google Sheets, and a
+session may still read the copy from before. Writes still waiting in
+the outbox are pushed as they were made, rows appended here included,
+so two clients writing the same month while either of them has an
+old copy overwrite each other. Local mode is meant for one writer per
+month at a time.
+"""
+import json
+import os
+import sqlite3
+import threading
+from rate_limit import LIMITER, background
+from sheets_client import LazySpreadsheet
+from write_buffer import entered_value, quoted, raw_values
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (title TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS cells (
+    sheet TEXT, row INTEGER, col INTEGER, value TEXT,
+    PRIMARY KEY (sheet, row, col)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT
+);
+"""
+
+# The calls above, which may each cost a request.
+SPREADSHEET_CALLS = {"worksheet", "values_batch_get", "values_batch_update",
+                     "values_append"}
+WORKSHEET_CALLS = {"get_all_values", "row_values", "col_values", "acell",
+                   "update_acell", "append_row", "update"}
+
+
+def split_range(name: str):
+    """Args:
+        name (str): Range with a sheet name, e.g. "'Overview'!B2:G13",
+            or only a sheet name for the whole sheet.
+    Returns:
+        (tuple): worksheet title and range in A1 notation, "" for the
+        whole sheet."""
+    title, _, range_name = name.rpartition("!")
+    if not title:
+        title, range_name = range_name, ""
+    if title.startswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, range_name
+
+
+class LocalWorksheet:
+    """A worksheet stored in a LocalSpreadsheet."""
+
+    def __init__(self, spreadsheet, title: str):
+        self.spreadsheet = spreadsheet
+        self.title = title
+
+    def get_all_values(self):
+        """Returns:
+        (list): all rows, padded to the same width like gspread's."""
+        return self.spreadsheet.read(self.title)
+
+    def row_values(self, row: int):
+        """Returns:
+        (list): values of one row, without trailing empty cells."""
+        return self.spreadsheet.read(self.title, row, row)[0]
+
+    def col_values(self, col: int):
+        """Returns:
+        (list): values of one column, without trailing empty cells."""
+        column = [row[col - 1] for row in self.get_all_values()]
+        while column and column[-1] == "":
+            column.pop()
+        return column
+
+    def acell(self, label: str):
+        """Returns:
+        (Cell): the cell, with None as the value of an empty cell."""
+        from gspread.cell import Cell
+        from gspread.utils import a1_to_rowcol
+
+        row, col = a1_to_rowcol(label)
+        values = self.row_values(row)
+        value = values[col - 1] if col <= len(values) else None
+        return Cell(row, col, value)
+
+    def update_acell(self, label: str, value):
+        self.spreadsheet.write(self.title, label, [[value]])
+
+    def update(self, range_name: str, values=None, **kwargs):
+        # gspread 5 writes ranges as RAW input by default.
+        self.spreadsheet.write(self.title, range_name, raw_values(values))
+
+    def append_row(self, values: list, value_input_option="RAW"):
+        from gspread.utils import rowcol_to_a1
+
+        row = self.spreadsheet.row_count(self.title) + 1
+        range_name = (
+            f"{rowcol_to_a1(row, 1)}:{rowcol_to_a1(row, len(values))}")
+        if value_input_option == "RAW":
+            values = raw_values([values])[0]
+        self.spreadsheet.write(self.title, range_name, [values])
+
+
+class LocalSpreadsheet:
+    """Offline-first copy of the spreadsheet in a SQLite file.
+    Worksheets are downloaded from remote the first time they are used.
+    Writes are committed locally and queued in an outbox for SyncWorker.
+    Without a remote, missing worksheets start out empty."""
+
+    def __init__(self, path: str, remote=None, title="Tag-Track"):
+        self.id = f"local:{os.path.abspath(path)}"
+        self.title = title
+        self.remote = remote
+        self.worker = SyncWorker(self, remote) if remote is not None else None
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+
+    def start(self):
+        """Starts connecting to remote and syncing the outbox.
+        Returns: None."""
+        if self.worker is not None:
+            self.remote.start()
+            self.worker.start()
+
+    def close(self):
+        """Pushes what is left in the outbox and stops syncing.
+        Returns: None."""
+        if self.worker is not None and self.worker.is_alive():
+            self.worker.stop()
+
+    def worksheet(self, title: str):
+        """Args:
+            title (str): Name of the worksheet.
+        Returns:
+            (LocalWorksheet): the worksheet, downloaded if needed."""
+        with self._lock:
+            known = self._db.execute(
+                "SELECT 1 FROM sheets WHERE title = ?", (title,)).fetchone()
+        if not known:
+            rows = []
+            if self.remote is not None:
+                rows = self.remote.worksheet(title).get_all_values()
+            self._store(title, rows)
+        return LocalWorksheet(self, title)
+
+    def refresh(self, title: str):
+        """Downloads a worksheet again if it changed in Google Sheets
+        since it was downloaded: if its first row, where the app keeps
+        the running totals, differs, or rows were added after the last
+        one here. Costs one request. A worksheet with writes still in
+        the outbox is left as it is, as is everything while remote
+        cannot be reached.
+        Args:
+            title (str): Name of the worksheet.
+        Returns:
+            (bool): whether the worksheet was downloaded again."""
+        if self.remote is None:
+            return False
+        with self._lock:
+            known = self._db.execute(
+                "SELECT 1 FROM sheets WHERE title = ?", (title,)).fetchone()
+            queued = self._queued(title)
+        # One not downloaded yet is when it is first used.
+        if not known or queued:
+            return False
+        last = self.row_count(title)
+        try:
+            first, after = [
+                value_range.get("values", [[]])[0]
+                for value_range in self.remote.values_batch_get([
+                    quoted(title, "1:1"),
+                    quoted(title, f"{last + 1}:{last + 1}"),
+                ])["valueRanges"]]
+            if first == self.read(title, 1, 1)[0] and not after:
+                return False
+            rows = self.remote.worksheet(title).get_all_values()
+        # Offline: keep working on the local copy.
+        except Exception:
+            return False
+        return self._store(title, rows, replace=True)
+
+    def _queued(self, title: str):
+        """Call with the lock held.
+        Returns:
+            (bool): whether writes to the worksheet wait in the outbox."""
+        return any(
+            split_range(entry["range"])[0] == title
+            for (data,) in self._db.execute("SELECT data FROM outbox")
+            for entry in json.loads(data))
+
+    def titles(self):
+        """Returns:
+        (list): names of the worksheets stored locally."""
+        with self._lock:
+            return [title for (title,) in
+                    self._db.execute("SELECT title FROM sheets")]
+
+    def _store(self, title: str, rows: list, replace=False):
+        """Stores a downloaded worksheet. With replace, its old cells
+        are dropped, unless it was written locally in the meantime.
+        Returns:
+            (bool): whether the rows were stored."""
+        cells = [
+            (title, row, col, value)
+            for row, values in enumerate(rows, 1)
+            for col, value in enumerate(values, 1)
+            if value != ""
+        ]
+        with self._lock, self._db:
+            if replace and self._queued(title):
+                return False
+            self._db.execute("INSERT OR IGNORE INTO sheets VALUES (?)",
+                             (title,))
+            if replace:
+                self._db.execute("DELETE FROM cells WHERE sheet = ?",
+                                 (title,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)", cells)
+        return True
+
+    def read(self, title: str, first_row=1, last_row=None):
+        """Args:
+            title (str): Name of the worksheet.
+            first_row (int): First row to return.
+            last_row (int): Last row to return, or the end of the sheet.
+        Returns:
+            (list): rows of values, padded with empty strings."""
+        query = "SELECT row, col, value FROM cells WHERE sheet = ?"
+        query += " AND row >= ?"
+        params = [title, first_row]
+        if last_row is not None:
+            query += " AND row <= ?"
+            params.append(last_row)
+        with self._lock:
+            cells = self._db.execute(query, params).fetchall()
+        if last_row is None:
+            last_row = max((row for row, _, _ in cells), default=0)
+        width = max((col for _, col, _ in cells), default=0)
+        rows = [[""] * width for _ in range(first_row, last_row + 1)]
+        for row, col, value in cells:
+            rows[row - first_row][col - 1] = value
+        if first_row == last_row:
+            while rows[0] and rows[0][-1] == "":
+                rows[0].pop()
+        return rows
+
+    def row_count(self, title: str):
+        """Returns:
+        (int): number of the last row holding a value."""
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COALESCE(MAX(row), 0) FROM cells WHERE sheet = ?",
+                (title,)).fetchone()
+        return count
+
+    def write(self, title: str, range_name: str, values: list):
+        """Writes user-entered values locally and queues them for sync.
+        Returns: None."""
+        self.values_batch_update(body={"data": [{
+            "range": quoted(title, range_name),
+            "values": values,
+        }]})
+
+    def values_batch_update(self, body=None, params=None):
+        """Applies a values batch_update body locally and queues it.
+        Values are treated as USER_ENTERED, as WriteBuffer sends them.
+        Returns:
+            (dict): an empty response."""
+        from gspread.utils import a1_range_to_grid_range
+
+        # A cell written twice holds the later value, as in Sheets.
+        latest = {}
+        for entry in body["data"]:
+            title, range_name = split_range(entry["range"])
+            grid = a1_range_to_grid_range(range_name)
+            top = grid.get("startRowIndex", 0) + 1
+            left = grid.get("startColumnIndex", 0) + 1
+            for row, values in enumerate(entry["values"], top):
+                for col, value in enumerate(values, left):
+                    latest[title, row, col] = str(entered_value(value))
+        cells = [(*key, value) for key, value in latest.items() if value]
+        cleared = [key for key, value in latest.items() if not value]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)", cells)
+            self._db.executemany(
+                "DELETE FROM cells WHERE sheet = ? AND row = ? AND col = ?",
+                cleared)
+            if self.remote is not None:
+                self._db.execute("INSERT INTO outbox (data) VALUES (?)",
+                                 (json.dumps(body["data"]),))
+        if self.worker is not None:
+            self.worker.notify()
+        return {}
+
+    def values_append(self, range, params=None, body=None):
+        """Appends rows after the last row holding a value, like the
+        values append API, in one step: appends made at once land on
+        different rows. Values are treated as USER_ENTERED.
+        Returns:
+            (dict): the response, with the range written as
+            ["updates"]["updatedRange"]."""
+        from gspread.utils import rowcol_to_a1
+
+        title, _ = split_range(range)
+        rows = [[str(entered_value(value)) for value in values]
+                for values in body["values"]]
+        width = max(map(len, rows), default=1)
+        with self._lock, self._db:
+            (last,) = self._db.execute(
+                "SELECT COALESCE(MAX(row), 0) FROM cells WHERE sheet = ?",
+                (title,)).fetchone()
+            written = quoted(title, f"{rowcol_to_a1(last + 1, 1)}:"
+                                    f"{rowcol_to_a1(last + len(rows), width)}")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)",
+                [(title, row, col, value)
+                 for row, values in enumerate(rows, last + 1)
+                 for col, value in enumerate(values, 1) if value])
+            if self.remote is not None:
+                self._db.execute(
+                    "INSERT INTO outbox (data) VALUES (?)",
+                    (json.dumps([{"range": written, "values": rows}]),))
+        if self.worker is not None:
+            self.worker.notify()
+        return {"updates": {"updatedRange": written}}
+
+    def values_batch_get(self, ranges: list, params=None):
+        """Reads several ranges, like the values batchGet API: trailing
+        empty cells and rows are left out, and so are "values" when the
+        whole range is empty.
+        Returns:
+            (dict): {"valueRanges": [...]}, in the order of ranges."""
+        from gspread.utils import a1_range_to_grid_range
+
+        value_ranges = []
+        for name in ranges:
+            title, range_name = split_range(name)
+            # Downloads the worksheet the first time, like worksheet().
+            self.worksheet(title)
+            grid = a1_range_to_grid_range(range_name)
+            left = grid.get("startColumnIndex", 0)
+            rows = [
+                row[left:grid.get("endColumnIndex")]
+                for row in self.read(title, grid.get("startRowIndex", 0) + 1,
+                                     grid.get("endRowIndex"))
+            ]
+            for row in rows:
+                while row and row[-1] == "":
+                    row.pop()
+            while rows and not rows[-1]:
+                rows.pop()
+            value_range = {"range": name}
+            if rows:
+                value_range["values"] = rows
+            value_ranges.append(value_range)
+        return {"valueRanges": value_ranges}
+
+    def pending(self, limit=100):
+        """Returns:
+        (list): (id, data) of the oldest queued writes."""
+        with self._lock:
+            return [
+                (outbox_id, json.loads(data))
+                for outbox_id, data in self._db.execute(
+                    "SELECT id, data FROM outbox ORDER BY id LIMIT ?",
+                    (limit,))
+            ]
+
+    def acknowledge(self, outbox_ids: list):
+        """Removes writes that reached remote from the outbox.
+        Returns: None."""
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?",
+                                 [(outbox_id,) for outbox_id in outbox_ids])
+
+
+class WrappedSpreadsheet:
+    """Passes everything on to a spreadsheet, running the calls of the
+    interface above through wrapper.call(name, func, *args, **kwargs).
+    Worksheets it returns are wrapped as well.
+    Args:
+        spreadsheet (Spreadsheet): Spreadsheet to wrap.
+        wrapper: e.g. a Tracer or a RateLimiter."""
+
+    def __init__(self, spreadsheet, wrapper):
+        self._spreadsheet = spreadsheet
+        self._wrapper = wrapper
+
+    def worksheet(self, title: str):
+        worksheet = self._wrapper.call(
+            "worksheet", self._spreadsheet.worksheet, title)
+        return WrappedWorksheet(worksheet, self)
+
+    def __getattr__(self, name):
+        value = getattr(self._spreadsheet, name)
+        if name not in SPREADSHEET_CALLS:
+            return value
+
+        def call(*args, **kwargs):
+            return self._wrapper.call(name, value, *args, **kwargs)
+
+        return call
+
+
+class WrappedWorksheet:
+    """A worksheet handed out by a WrappedSpreadsheet."""
+
+    def __init__(self, worksheet, spreadsheet):
+        self._worksheet = worksheet
+        # WriteBuffer sends queued writes through this, wrapped too.
+        self.spreadsheet = spreadsheet
+
+    def __getattr__(self, name):
+        value = getattr(self._worksheet, name)
+        if name not in WORKSHEET_CALLS:
+            return value
+
+        def call(*args, **kwargs):
+            return self.spreadsheet._wrapper.call(name, value, *args,
+                                                  **kwargs)
+
+        return call
+
+
+class SyncWorker(threading.Thread):
+    """Pushes a LocalSpreadsheet's outbox to Google Sheets.
+    Queued writes are merged into one values batch_update per push and
+    retried with exponential backoff while remote is unreachable. In
+    between, it checks local copies against remote (see check())."""
+
+    def __init__(self, local, remote, interval=2.0, batch=100,
+                 max_backoff=60.0):
+        super().__init__(name="sheets-sync", daemon=True)
+        self.local = local
+        self.remote = remote
+        self.interval = interval
+        self.batch = batch
+        self.max_backoff = max_backoff
+        self.pushed = 0
+        self.failures = 0
+        self.last_error = None
+        # Titles of the worksheets to check, guarded by _checks_lock.
+        self._checks = set()
+        self._checks_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self):
+        """Wakes the worker up after a local write. Returns: None."""
+        self._wake.set()
+
+    def check(self, title: str):
+        """Asks for the local copy of a worksheet to be checked against
+        remote (see LocalSpreadsheet.refresh()) in the worker thread.
+        Returns: None."""
+        with self._checks_lock:
+            self._checks.add(title)
+        self._wake.set()
+
+    def run_checks(self):
+        """Checks the worksheets asked for since the last time.
+        Returns: None."""
+        with self._checks_lock:
+            titles, self._checks = self._checks, set()
+        with background():
+            for title in titles:
+                self.local.refresh(title)
+
+    def push(self):
+        """Sends one batch of queued writes to remote.
+        Returns:
+            (int): number of queued writes sent."""
+        pending = self.local.pending(self.batch)
+        if not pending:
+            return 0
+        data = [entry for _, entries in pending for entry in entries]
+        with background():
+            self.remote.values_batch_update(
+                body={"valueInputOption": "USER_ENTERED", "data": data})
+        self.local.acknowledge([outbox_id for outbox_id, _ in pending])
+        self.pushed += len(pending)
+        return len(pending)
+
+    def run(self):
+        backoff = self.interval
+        while True:
+            try:
+                while self.push():
+                    pass
+                # Not on the way out, which should not wait on them.
+                if not self._stopping.is_set():
+                    self.run_checks()
+                backoff = self.interval
+            except Exception as error:
+                self.failures += 1
+                self.last_error = error
+                backoff = min(backoff * 2, self.max_backoff)
+            if self._stopping.is_set():
+                return
+            self._wake.wait(backoff)
+            self._wake.clear()
+
+    def stop(self, timeout=30.0):
+        """Pushes what is left, then stops the worker.
+        Returns: None."""
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+
+
+def refresh_local(spreadsheet, title: str):
+    """Starts bringing the local copy of a worksheet up to date in the
+    background, for storage keeping one synced (see SyncWorker.check()).
+    Args:
+        spreadsheet (Spreadsheet): Storage backend, wrapped or not.
+        title (str): Name of the worksheet.
+    Returns: None."""
+    while isinstance(spreadsheet, WrappedSpreadsheet):
+        spreadsheet = spreadsheet._spreadsheet
+    if (isinstance(spreadsheet, LocalSpreadsheet)
+            and spreadsheet.worker is not None):
+        spreadsheet.worker.check(title)
+
+
+def open_storage(name: str):
+    """Picks the storage backend from the TAG_TRACK_STORAGE variable:
+    "sheets" (default) talks to Google Sheets directly, "local" keeps a
+    SQLite copy in TAG_TRACK_DB synced in the background, and "offline"
+    uses the SQLite file only.
+    Args:
+        name (str): Name of the spreadsheet.
+    Google Sheets is always reached through the shared rate limiter.
+    Returns:
+        (WrappedSpreadsheet or LocalSpreadsheet): the storage backend."""
+    mode = os.environ.get("TAG_TRACK_STORAGE", "sheets")
+    if mode == "sheets":
+        return WrappedSpreadsheet(LazySpreadsheet(name), LIMITER)
+    path = os.environ.get("TAG_TRACK_DB", "tag-track.db")
+    remote = None
+    if mode == "local":
+        remote = WrappedSpreadsheet(LazySpreadsheet(name), LIMITER)
+    return LocalSpreadsheet(path, remote, name)
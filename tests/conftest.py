@@ -0,0 +1,7 @@
+"""Shared set-up of the tests: the repository root on the import path,
+and snapshots kept out of the working tree."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TAG_TRACK_SNAPSHOTS"] = ""
@@ -0,0 +1,80 @@
+"""Quitting with autosaved expenses puts the month back as it was."""
+import builtins
+import contextlib
+import io
+import pytest
+import run
+from fake_sheets import FakeSheets, FakeSpreadsheet, quota_error
+
+# Pick March, keep its budget, log €5.00 of Groceries, then quit.
+ANSWERS = ["Ana", "3", "p", "u", "2", "5", "p", "c", "q"]
+
+
+class FailingSpreadsheet(FakeSpreadsheet):
+    """Fails the next `failures` values batch_update requests."""
+
+    failures = 0
+
+    def values_batch_update(self, body=None, params=None):
+        if self.failures:
+            self.failures -= 1
+            raise quota_error("Quota exceeded for quota metric 'Write'")
+        return super().values_batch_update(body, params)
+
+
+@pytest.fixture
+def server():
+    server = FakeSheets()
+    server.seed_months(run.MONTHS.values())
+    server.backend.write("March", "A1:O1", [[
+        "Budget:", "€1000.00", "", "", "Remaining:", "€900.00", "",
+        "10000", "0", "0", "0", "0", "0", "1", ""]])
+    server.backend.write("March", "A3", [["€100.00"]])
+    return server
+
+
+def month(server):
+    return server.backend.read("March"), server.backend.read("Overview")
+
+
+def quit_after_failures(server, monkeypatch, failures: int):
+    """Runs the prompts until the user quits, failing the writes that
+    put the month back.
+    Returns:
+        (str): what the prompts printed."""
+    sheet = FailingSpreadsheet(server)
+    answers = iter(ANSWERS)
+
+    def answer(prompt=""):
+        value = next(answers)
+        if value == "q":
+            run.current_session().autosave.drain()
+            sheet.failures = failures
+        return value
+
+    monkeypatch.setattr(builtins, "input", answer)
+    monkeypatch.setattr(run, "clear_terminal", lambda: None)
+    run.SESSION.set(run.Session(sheet))
+    shown = io.StringIO()
+    with contextlib.redirect_stdout(shown):
+        run.run_screens(run.ask_name)
+    run.end_session()
+    return shown.getvalue()
+
+
+def test_quit_puts_month_back(server, monkeypatch):
+    before = month(server)
+    quit_after_failures(server, monkeypatch, failures=0)
+    assert month(server) == before
+
+
+def test_quit_after_failed_restore_puts_month_back(server, monkeypatch):
+    before = month(server)
+    shown = quit_after_failures(server, monkeypatch, failures=1)
+    assert month(server) == before
+    assert "still in your Month sheet" not in shown
+
+
+def test_quit_tells_user_when_restore_keeps_failing(server, monkeypatch):
+    shown = quit_after_failures(server, monkeypatch, failures=2)
+    assert "still in your Month sheet" in shown
@@ -0,0 +1,160 @@
+"""Running totals of a month sheet (see ledger) against FakeSheets."""
+import pytest
+import ledger
+from fake_sheets import FakeSheets
+from sheet_cache import SheetCache
+
+# Cents of each row, by category; amounts go in as the app writes them.
+ROWS = [
+    [50000, 1250, 0, 0, 0, 0],
+    [0, 725, 0, 300, 0, 0],
+    [0, 0, 2000, 0, 0, 199],
+]
+
+
+def values(cents: list):
+    return [f"€{value // 100}.{value % 100:02d}" if value else ""
+            for value in cents]
+
+
+def sums(rows: list):
+    return [sum(column) for column in zip(*rows)]
+
+
+@pytest.fixture
+def server():
+    server = FakeSheets()
+    server.seed_months(["March"])
+    return server
+
+
+def write_rows(server, first: int, rows: list):
+    for row, cents in enumerate(rows, first):
+        server.backend.write("March", f"A{row}:F{row}", [values(cents)])
+
+
+def store(server, rows: list):
+    """Writes rows below the headers and running totals covering them.
+    Returns: None."""
+    write_rows(server, ledger.HEADER_ROWS + 1, rows)
+    checksum = ledger.row_checksum(rows[-1]) if rows else None
+    server.backend.write("March", ledger.LEDGER_RANGE, [ledger.ledger_values(
+        sums(rows) if rows else [0] * ledger.CATEGORIES, len(rows),
+        checksum)])
+
+
+def session(server):
+    """Returns:
+    (tuple): a fresh cache and the month worksheet, as a new session
+    reads them."""
+    return SheetCache(), server.spreadsheet.worksheet("March")
+
+
+def stored(server):
+    return ledger.read_ledger(server.backend.read("March", 1, 1)[0])
+
+
+def requests(server, method="values_batch_get"):
+    return server.snapshot()[method]
+
+
+def test_stored_totals_need_only_the_last_row(server):
+    store(server, ROWS)
+    cache, worksheet = session(server)
+    assert ledger.load_totals(cache, worksheet) == (sums(ROWS), 3)
+    assert requests(server) == 1
+
+
+def test_appended_tail_is_added(server):
+    store(server, ROWS[:1])
+    write_rows(server, ledger.HEADER_ROWS + 2, ROWS[1:])
+    cache, worksheet = session(server)
+    assert ledger.load_totals(cache, worksheet) == (sums(ROWS), 3)
+    # The tail from the last covered row on, and nothing above it.
+    assert requests(server) == 1
+    assert stored(server) == (sums(ROWS), 3)
+
+
+def test_edited_last_row_is_read_again(server):
+    store(server, ROWS)
+    edited = ROWS[:2] + [[0, 0, 1000, 0, 0, 199]]
+    write_rows(server, ledger.HEADER_ROWS + 3, edited[2:])
+    cache, worksheet = session(server)
+    assert ledger.load_totals(cache, worksheet) == (sums(edited), 3)
+    assert stored(server) == (sums(edited), 3)
+
+
+def test_remove_last_row(server):
+    store(server, ROWS)
+    cache, worksheet = session(server)
+    last = ledger.HEADER_ROWS + len(ROWS)
+    assert ledger.remove_row(cache, worksheet, last, ledger.CATEGORIES)
+    assert stored(server) == (sums(ROWS[:2]), 2)
+    # The totals now end at the row before, checksum included.
+    assert ledger.load_totals(*session(server)) == (sums(ROWS[:2]), 2)
+    assert not any(server.backend.read("March", last, last)[0])
+
+
+def test_remove_middle_row(server):
+    store(server, ROWS)
+    cache, worksheet = session(server)
+    middle = ledger.HEADER_ROWS + 2
+    assert ledger.remove_row(cache, worksheet, middle, ledger.CATEGORIES)
+    kept = [ROWS[0], ROWS[2]]
+    assert stored(server) == (sums(kept), 3)
+    assert ledger.load_totals(*session(server)) == (sums(kept), 3)
+    assert not any(server.backend.read("March", middle, middle)[0])
+
+
+def test_remove_row_not_covered(server):
+    store(server, ROWS[:1])
+    cache, worksheet = session(server)
+    assert not ledger.remove_row(
+        cache, worksheet, ledger.HEADER_ROWS + 2, ledger.CATEGORIES)
+    assert stored(server) == (sums(ROWS[:1]), 1)
+
+
+def test_record_row_into_blanked_row(server):
+    store(server, ROWS)
+    cache, worksheet = session(server)
+    middle = ledger.HEADER_ROWS + 2
+    ledger.remove_row(cache, worksheet, middle, ledger.CATEGORIES)
+    added = [0, 0, 0, 0, 4200, 0]
+    assert ledger.record_row(cache, worksheet, added, middle) == middle
+    cache.append_row(worksheet, values(added), middle)
+    rows = [ROWS[0], added, ROWS[2]]
+    assert stored(server) == (sums(rows), 3)
+    assert ledger.load_totals(*session(server)) == (sums(rows), 3)
+    assert ledger.verify(*session(server)) == {}
+
+
+def test_record_row_appended(server):
+    store(server, ROWS[:2])
+    cache, worksheet = session(server)
+    row = cache.append_row(worksheet, values(ROWS[2]))
+    assert row == ledger.HEADER_ROWS + 3
+    ledger.load_totals(cache, worksheet)
+    assert stored(server) == (sums(ROWS), 3)
+    assert ledger.verify(*session(server)) == {}
+
+
+def test_verify_reports_and_fixes_drift(server):
+    store(server, ROWS)
+    # An edit above the last row, which the checksum does not cover.
+    edited = [ROWS[0], [0, 925, 0, 300, 0, 0], ROWS[2]]
+    write_rows(server, ledger.HEADER_ROWS + 2, edited[1:2])
+    assert ledger.load_totals(*session(server)) == (sums(ROWS), 3)
+    drift = ledger.verify(*session(server))
+    assert drift == {2: (sums(ROWS)[1], sums(edited)[1])}
+    assert stored(server) == (sums(edited), 3)
+    assert ledger.verify(*session(server)) == {}
+
+
+def test_verify_reports_rows_the_totals_miss(server):
+    store(server, ROWS)
+    # Totals missing the last row, though they name it and its checksum.
+    server.backend.write("March", ledger.LEDGER_RANGE, [ledger.ledger_values(
+        sums(ROWS[:2]), 3, ledger.row_checksum(ROWS[2]))])
+    drift = ledger.verify(*session(server))
+    assert drift == {3: (0, 2000), 6: (0, 199)}
+    assert stored(server) == (sums(ROWS), 3)
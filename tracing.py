@@ -0,0 +1,161 @@
+"""Counts and times every storage call and flow stage of a session.
+
+Switched on per process by environment variables:
+
+    TAG_TRACK_TRACE=1               report per session on stderr at exit
+    TAG_TRACK_TRACE_LOG=trace.jsonl  also append one JSON line per event
+
+Storage calls are timed by wrapping the spreadsheet and the worksheets
+it hands out (see traced() and storage.WrappedSpreadsheet); stages are
+timed by Tracer.stage(). Bytes are the size of the arguments and
+results as JSON, an estimate of what goes over the wire.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from storage import WrappedSpreadsheet
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500]
+# The stage running in this thread or task.
+STAGE = ContextVar("stage", default=None)
+
+
+def size(value):
+    """Returns:
+    (int): bytes of value as JSON, anything unknown as its str()."""
+    if value is None:
+        return 0
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode())
+
+
+class Tracer:
+    """Records the calls and stages of one session.
+    Args:
+        log (str): Path to append JSON lines to, or None."""
+
+    def __init__(self, log=None):
+        self.session = uuid.uuid4().hex[:8]
+        self.log = log
+        self._lock = threading.Lock()
+        self._times = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._sent = defaultdict(int)
+        self._received = defaultdict(int)
+        self._calls = defaultdict(int)
+
+    @classmethod
+    def from_env(cls):
+        """Returns:
+        (Tracer): a tracer if TAG_TRACK_TRACE is set, else None."""
+        log = os.environ.get("TAG_TRACK_TRACE_LOG")
+        if os.environ.get("TAG_TRACK_TRACE") or log:
+            return cls(log)
+        return None
+
+    def record(self, kind: str, name: str, seconds: float, sent=0,
+               received=0, error=None):
+        """Adds one call or stage.
+        Returns: None."""
+        key = (kind, name)
+        stage = STAGE.get()
+        with self._lock:
+            self._times[key].append(seconds)
+            self._sent[key] += sent
+            self._received[key] += received
+            if error is not None:
+                self._errors[key] += 1
+            if kind == "call" and stage is not None:
+                self._calls[stage] += 1
+            if self.log:
+                event = {
+                    "session": self.session, "kind": kind, "name": name,
+                    "stage": stage, "ms": round(seconds * 1000, 3),
+                    "sent": sent, "received": received,
+                    "error": None if error is None else repr(error),
+                    "time": time.time(),
+                }
+                with open(self.log, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(event) + "\n")
+
+    def call(self, name: str, func, *args, **kwargs):
+        """Runs func as the storage call name and records it.
+        Returns:
+            the result of func."""
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self.record("call", name, time.perf_counter() - start,
+                        size([args, kwargs]), error=error)
+            raise
+        self.record("call", name, time.perf_counter() - start,
+                    size([args, kwargs]), size(result))
+        return result
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the block as the flow stage name. Storage calls made in
+        it, including in pool threads given the context, count towards
+        the stage."""
+        token = STAGE.set(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as raised:
+            error = raised
+            raise
+        finally:
+            STAGE.reset(token)
+            self.record("stage", name, time.perf_counter() - start,
+                        error=error)
+
+    def report(self):
+        """Returns:
+        (str): calls and stages with counts, bytes and latencies."""
+        with self._lock:
+            keys = sorted(self._times)
+            lines = [
+                f"Trace of session {self.session}",
+                f"{'':5} {'name':24} {'count':>5} {'err':>3} {'sent':>8} "
+                f"{'recv':>8} {'p50 ms':>7} {'max ms':>7}  "
+                f"ms <{' <'.join(map(str, BUCKETS))} >",
+            ]
+            for kind, name in keys:
+                times = sorted(self._times[kind, name])
+                histogram = [0] * (len(BUCKETS) + 1)
+                for seconds in times:
+                    histogram[bisect(BUCKETS, seconds * 1000)] += 1
+                label = name
+                if kind == "stage":
+                    label = f"{name} ({self._calls[name]} calls)"
+                lines.append(
+                    f"{kind:5} {label:24} {len(times):5} "
+                    f"{self._errors[kind, name]:3} "
+                    f"{self._sent[kind, name]:8} "
+                    f"{self._received[kind, name]:8} "
+                    f"{times[len(times) // 2] * 1000:7.1f} "
+                    f"{times[-1] * 1000:7.1f}  "
+                    f"{' '.join(map(str, histogram))}")
+        return "\n".join(lines)
+
+
+def stage(tracer, name: str):
+    """Returns:
+    a context manager timing the stage, or doing nothing untraced."""
+    return nullcontext() if tracer is None else tracer.stage(name)
+
+
+def traced(spreadsheet, tracer):
+    """Returns:
+    spreadsheet, with every call recorded by tracer if there is one."""
+    if tracer is None:
+        return spreadsheet
+    return WrappedSpreadsheet(spreadsheet, tracer)
@@ -0,0 +1,130 @@
+def quoted(title: str, range_name=None):
+    """Returns:
+    (str): range_name on worksheet title, e.g. "'May'!A1:N1", or the
+    whole worksheet without range_name."""
+    title = "'" + title.replace("'", "''") + "'"
+    return title if range_name is None else f"{title}!{range_name}"
+
+
+def append_values(spreadsheet, title: str, values: list):
+    """Appends one row after the last row of the worksheet holding any,
+    with one values append request. Unlike writes to a row number, two
+    appends at once never land on the same row.
+    Args:
+        spreadsheet (Spreadsheet): Spreadsheet holding the worksheet.
+        title (str): Name of the worksheet.
+        values (list): User-entered values of the row.
+    Returns:
+        (int): number of the row written, from 1."""
+    from gspread.utils import a1_range_to_grid_range
+
+    response = spreadsheet.values_append(
+        quoted(title), params={"valueInputOption": "USER_ENTERED"},
+        body={"values": [values]})
+    written = response["updates"]["updatedRange"].rpartition("!")[2]
+    return a1_range_to_grid_range(written)["startRowIndex"] + 1
+
+
+def raw_values(values: list):
+    """Marks string values to be stored as typed, like RAW input.
+    A leading apostrophe stops Sheets from parsing the value, so raw and
+    user-entered writes can share one USER_ENTERED request.
+    Args:
+        values (list): Rows of values.
+    Returns:
+        (list): Rows with every non-empty string prefixed by "'"."""
+    return [
+        [f"'{value}" if isinstance(value, str) and value else value
+         for value in row]
+        for row in values
+    ]
+
+
+def entered_value(value):
+    """Returns:
+    the value Sheets stores for a USER_ENTERED value, minus parsing."""
+    if isinstance(value, str) and value.startswith("'"):
+        return value[1:]
+    return value
+
+
+class WriteBuffer:
+    """Collects cell and range writes for a session.
+    flush() sends them as one values batch_update per spreadsheet."""
+
+    def __init__(self):
+        self._pending = {}
+        self.queued = 0
+        self.flushed = 0
+        self.requests = 0
+
+    def queue(self, worksheet, range_name: str, values: list, raw=False):
+        """Queues a write of values to range_name on worksheet.
+        Args:
+            worksheet (Worksheet): Worksheet to be written.
+            range_name (str): Range in A1 notation, e.g. "B1" or "A3:F3".
+            values (list): Rows of values to be written.
+            raw (bool): Store strings as typed, like append_row() does.
+        Returns: None."""
+        if raw:
+            values = raw_values(values)
+        spreadsheet = worksheet.spreadsheet
+        _, data = self._pending.setdefault(spreadsheet.id, (spreadsheet, []))
+        data.append({
+            "range": quoted(worksheet.title, range_name),
+            "values": values,
+        })
+        self.queued += 1
+
+    def pending(self):
+        """Returns:
+        (int): number of writes waiting to be flushed."""
+        return sum(len(data) for _, data in self._pending.values())
+
+    def take(self):
+        """Removes the pending writes without sending them.
+        Returns:
+            (list): values batch_update data of every pending write."""
+        data = [entry for _, pending in self._pending.values()
+                for entry in pending]
+        self._pending.clear()
+        return data
+
+    def forget(self, written: dict):
+        """Drops the pending writes if what each range would end up
+        holding has been written already, e.g. by Autosave.
+        Args:
+            written (dict): Values by range name, as queued.
+        Returns:
+            (bool): whether the writes were dropped."""
+        latest = {}
+        for _, data in self._pending.values():
+            for entry in data:
+                latest[entry["range"]] = entry["values"]
+        if not latest or any(
+                written.get(name) != values
+                for name, values in latest.items()):
+            return False
+        self._pending.clear()
+        return True
+
+    def flush(self):
+        """Sends every pending write, one request per spreadsheet.
+        Writes stay queued if their request fails.
+        Returns: None."""
+        for spreadsheet_id, (spreadsheet, data) in list(self._pending.items()):
+            spreadsheet.values_batch_update(
+                body={"valueInputOption": "USER_ENTERED", "data": data})
+            self.requests += 1
+            self.flushed += len(data)
+            del self._pending[spreadsheet_id]
+
+    def stats(self):
+        """Returns:
+        (dict): queued writes, requests sent and requests saved."""
+        return {
+            "queued": self.queued,
+            "pending": self.pending(),
+            "requests": self.requests,
+            "saved": self.flushed - self.requests,
+        }